@@ -1,19 +1,75 @@
 
+import array
+import asyncio
+import contextlib
+import inspect
+import operator
+import os
+import pickle
+import random
+import time
+
+
+def _float(value):
+    return float('nan') if value is None else value
+
+
+def _optional(value):
+    return None if value != value else value # NaN means not set
+
 
 class Parameter():
 
+    """
+    A view of one parameter of a ParameterSpace. A Parameter created on its own gets a
+    space of its own. An Optimization given one works on a copy in its own space and
+    writes the copy's value back to it once the search ends.
+    """
+    __slots__ = ("_space", "_index")
+
     def __init__(self, name=None, min=None, max=None, value=None):
-        self.name = name
-        self.min = min
-        self.max = max
-        if min and max:
-            if value:
+        self._space = ParameterSpace()
+        self._index = self._space._append(name, min, max, None)
+        if min is not None and max is not None:
+            if value is not None:
                 assert(value <= max)
                 assert(value >= min)
                 self.value = value
             else:
                 self.value = (max - min) / 2 + min
 
+    @property
+    def name(self):
+        return self._space.names[self._index]
+
+    @name.setter
+    def name(self, name):
+        self._space.names[self._index] = name
+
+    @property
+    def min(self):
+        return _optional(self._space.mins[self._index])
+
+    @min.setter
+    def min(self, min):
+        self._space.mins[self._index] = _float(min)
+
+    @property
+    def max(self):
+        return _optional(self._space.maxs[self._index])
+
+    @max.setter
+    def max(self, max):
+        self._space.maxs[self._index] = _float(max)
+
+    @property
+    def value(self):
+        return _optional(self._space.values[self._index])
+
+    @value.setter
+    def value(self, value):
+        self._space.values[self._index] = _float(value)
+
     def from_dict(self, dict):
         self.name = dict["name"]
         self.min = dict["min"]
@@ -35,20 +91,235 @@ class Parameter():
         return str(self.to_dict())
 
 
+class ParameterSpace():
+
+    """
+    Names, bounds and values of a list of Parameters kept as contiguous arrays, with the
+    Parameters becoming views into them. Checks over whole points go through builtins
+    instead of looping over Parameter objects.
+    """
+    def __init__(self, params=()):
+        self.names = []
+        self.mins = array.array('d')
+        self.maxs = array.array('d')
+        self.values = array.array('d')
+        self.params = []
+        for p in params:
+            p._index = self._append(p.name, p.min, p.max, p.value)
+            p._space = self
+            self.params.append(p)
+
+    def _append(self, name, min, max, value):
+        self.names.append(name)
+        self.mins.append(_float(min))
+        self.maxs.append(_float(max))
+        self.values.append(_float(value))
+        return len(self.names) - 1
+
+    def __len__(self):
+        return len(self.names)
+
+    def point(self):
+        return tuple(self.values)
+
+    def set_point(self, point):
+        self.values = array.array('d', point)
+
+    def valid(self, point):
+        return all(map(operator.le, self.mins, point)) and all(map(operator.le, point, self.maxs))
+
+    def clip(self, point):
+        return list(map(min, self.maxs, map(max, self.mins, point)))
+
+    """
+    Reflect values that fall outside of their bounds back in, values that are still
+    out after one reflection are put on the bound they were reflected off
+    """
+    def reflect(self, point):
+        return list(map(_reflect, point, self.mins, self.maxs))
+
+    """
+    Reflect only the values at the locations dims of point, in place
+    """
+    def reflect_at(self, point, dims):
+        for j in dims:
+            point[j] = _reflect(point[j], self.mins[j], self.maxs[j])
+
+
+def _reflect(value, min, max):
+    if value > max:
+        value = max - (value - max)
+        if value < min:
+            value = max
+    elif value < min:
+        value = min + (min - value)
+        if value > max:
+            value = min
+    return value
+
+
+"""
+Directory for scratch files, tmpfs (/dev/shm) when it is available
+"""
+def _scratch_base():
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return None
+
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def _not_timed(name):
+    return _NOT_TIMED
+
+
+"""
+Section timer of a Profiler (see profiler.py), a no-op without one:
+    timed = _timer(self.profiler)
+    with timed("rank"):
+        ...
+"""
+def _timer(profiler):
+    return _not_timed if profiler is None else profiler.time
+
+
+"""
+Fidelity of each of n points from a level (None, one level or a list of them, like
+phase), or None if they are all at full fidelity
+"""
+def _levels(level, n):
+    if level is None:
+        return None
+    levels = level if isinstance(level, list) else [level] * n
+    return None if all([level is None for level in levels]) else levels
+
+
+"""
+Locations of the points at each level, (level, locations) by first appearance
+"""
+def _by_level(levels):
+    groups = {}
+    for i, level in enumerate(levels):
+        groups.setdefault(level, []).append(i)
+    return groups.items()
+
+
+CALLS = ("kwargs", "positional", "array")
+
+
+class Objective():
+
+    """
+    Picklable callable evaluating func at a point given as a sequence of values
+    (ordered like names), so it can be sent to worker processes. A fidelity other
+    than None is passed on to func as its fidelity argument.
+    """
+    def __init__(self, func, names, batch=False, call="kwargs"):
+        assert(call in CALLS)
+        self.func = func
+        self.names = names
+        self.batch = batch
+        self.call = call
+
+    def __call__(self, point, fidelity=None):
+        if fidelity is not None:
+            return self._at(point, fidelity)
+        if self.batch:
+            return self.func([list(point)])[0]
+        if self.call == "positional":
+            return self.func(*point)
+        if self.call == "array":
+            return self.func(point)
+        return self.func(**dict(zip(self.names, point)))
+
+    def _at(self, point, fidelity):
+        if self.batch:
+            return self.func([list(point)], fidelity=fidelity)[0]
+        if self.call == "positional":
+            return self.func(*point, fidelity=fidelity)
+        if self.call == "array":
+            return self.func(point, fidelity=fidelity)
+        return self.func(fidelity=fidelity, **dict(zip(self.names, point)))
+
+
 class Optimization():
 
-    def __init__(self, func, params):
+    """
+    args:
+        func: function to minimize, called with the parameters as keyword arguments
+        params: list of Parameters (or dicts) to optimize over
+        batch: if True, func is instead called with a list of points (each a list of
+            values in the order of self.params) and returns a list with one error per point
+        seed: seed for this optimizer's random stream (defaults to the global random module)
+        cache: EvaluationCache remembering evaluated points (or an EvaluationStore
+            remembering them across runs), None to always call func
+        executor: concurrent.futures executor (thread or process pool) used to evaluate
+            the points of a batch concurrently, func must be picklable for process pools
+        history: HistoryRecorder streaming every evaluation to disk
+        profiler: Profiler timing the search and the objective, with callbacks on
+            evaluations, itterations and improvements
+        surrogate: model of func (e.g. surrogate.RBFSurrogate) fitted on every
+            evaluation, used by DDS and SCE to screen candidates before evaluating them
+        shared: SharedData used by func, closed (its files removed) once the search
+            is finished
+        fidelity: multi_fidelity.SuccessiveHalving screening the DDS candidates and SCE
+            mutation points at lower fidelities (func must take a fidelity argument)
+        call: how func gets a point when not batched
+            kwargs: func(name=value, ...)
+            positional: func(*values), values in the order of self.params
+            array: func(values), a tuple in the order of self.params
+    """
+    def __init__(self, func, params, batch=False, seed=None, cache=None, executor=None,
+                 history=None, call="kwargs", profiler=None, surrogate=None, shared=None,
+                 fidelity=None):
         self.func = func
+        self.batch = batch
+        self.call = call
+        self.executor = executor
+        self.random = random if seed is None else random.Random(seed)
         self.params = []
+        self._given = [] # (caller's Parameter, copy), see _write_back()
         for p in params:
+            po = Parameter()
             if type(p) is dict: # Convert from dict
-                po = Parameter()
                 po.from_dict(p)
-                self.params.append(po)
-            else:
-                self.params.append(p)
+            else: # Copied, it may be in another Optimization's space
+                po.from_dict(p.to_dict())
+                self._given.append((p, po))
+            self.params.append(po)
         self.params.sort(key=lambda x: x.name)
+        self.space = ParameterSpace(self.params)
         self.error = float('inf')
+        self.finished = False
+        self.paused = False
+        self.pause_at = None
+        self.evaluations = 0
+        self.best_point = None # Best point evaluated so far, and its error
+        self.best_error = float('inf')
+        self.stopping = {}
+        self.stop_reason = None
+        self._improved_at = 0
+        self._started = time.time()
+        self.state = None # Loop state of the running search, see checkpoint()
+        self._arguments = ((), {})
+        self._search_steps = None
+        self._pending = []
+        self.checkpoint_path = None
+        self.phase = None # What the search is evaluating, a name or a list (one per point)
+        self.level = None # Fidelity it is evaluating at (None for full), like phase
+        self.cache = cache
+        if cache is not None:
+            cache.bind(self.params)
+        self.history = history
+        if history is not None:
+            history.bind(self.space.names)
+        self.profiler = profiler
+        self.surrogate = surrogate
+        if surrogate is not None:
+            surrogate.bind(self.params)
+        self.shared = shared
+        self.fidelity = fidelity
 
     def __str__(self):
         str = "Minimum: {:.5f}\nValues:\n".format(self.error)
@@ -56,36 +327,442 @@ class Optimization():
         return str
 
     def _params_to_tuple(self):
-        pt = []
-        for p in self.params:
-            pt.append(p.value)
-        pt = tuple(pt)
-        return pt
+        return self.space.point()
 
     def _tuple_to_params(self, t):
-        for i in range(len(self.params)):
-            self.params[i].value = t[i]
+        self.space.set_point(t)
 
+    def _objective(self):
+        return Objective(self.func, self.space.names, self.batch, self.call)
 
     def _valid_point(self, point):
-        for i in range(len(self.params)):
-            if point[i] < self.params[i].min or \
-               point[i] > self.params[i].max:
-                return False
-        return True
+        return self.space.valid(point)
 
     def _run(self, params=None):
-        kwargs = {}
         if not params:
-            for p in self.params:
-                kwargs[p.name] = p.value
+            params = self._params_to_tuple()
+        return self._run_batch([params])[0]
+
+    """
+    Evaluate several independent points, returning one error per point.
+    Points already in the cache (or repeated in the batch) are only evaluated once.
+    """
+    def _run_batch(self, points):
+        levels = _levels(self.level, len(points))
+        results, missing = self._from_cache(points, levels)
+        if missing:
+            self._store(points, results, missing,
+                        self._evaluate([points[locs[0]] for locs in missing],
+                                       levels and [levels[locs[0]] for locs in missing]),
+                        levels)
+        return results
+
+    """
+    Results of the cached points (None for the rest) and the locations of each distinct
+    point that still needs to be evaluated. Points at a lower fidelity (levels as for
+    _levels()) are never cached, each is evaluated on its own.
+    """
+    def _from_cache(self, points, levels=None):
+        if self.cache is None:
+            return [None] * len(points), [[i] for i in range(len(points))]
+        results = [None] * len(points)
+        missing = {}
+        for i, point in enumerate(points):
+            if levels is not None and levels[i] is not None:
+                missing[i, None] = [i] # Can't be a cache key, those are numbers
+                continue
+            results[i] = self.cache.get(point)
+            if results[i] is None:
+                missing.setdefault(self.cache.key(point), []).append(i)
+        return results, list(missing.values())
+
+    def _store(self, points, results, missing, evaluated, levels=None):
+        for locs, result in zip(missing, evaluated):
+            if self.cache is not None and (levels is None or levels[locs[0]] is None):
+                self.cache.put(points[locs[0]], result)
+            for i in locs:
+                results[i] = result
+        phases = self.phase
+        if isinstance(phases, list):
+            phases = [phases[locs[0]] for locs in missing]
+        self._record([points[locs[0]] for locs in missing], evaluated, phases,
+                     levels and [levels[locs[0]] for locs in missing])
+
+    """
+    Everything that has been evaluated goes through here, levels as for _levels()
+    """
+    def _record(self, points, results, phases=None, levels=None):
+        if phases is None:
+            phases = self.phase
+        if self.history is not None:
+            self.history.record(points, results, phases)
+        if self.profiler is not None:
+            self.profiler.evaluated(points, results, phases)
+        if self.surrogate is not None:
+            levels = _levels(levels, len(points))
+            if levels is not None: # Only fitted on full fidelity
+                full = [i for i, level in enumerate(levels) if level is None]
+                points, results = [points[i] for i in full], [results[i] for i in full]
+            self.surrogate.add(points, results)
+
+    """
+    Call func on the points (at levels, one per point, if not all at full fidelity).
+    Batched objectives get all of the points of a level in a single call, otherwise
+    they are spread over the executor (if any).
+    """
+    def _evaluate(self, points, levels=None):
+        if self.batch:
+            if levels is None:
+                with _timer(self.profiler)("objective"):
+                    results = list(self.func([list(point) for point in points]))
+                assert(len(results) == len(points))
+                return results
+            results = [None] * len(points)
+            for level, locs in _by_level(levels):
+                kwargs = {} if level is None else {"fidelity": level}
+                with _timer(self.profiler)("objective"):
+                    evaluated = list(self.func([list(points[i]) for i in locs], **kwargs))
+                assert(len(evaluated) == len(locs))
+                for i, result in zip(locs, evaluated):
+                    results[i] = result
+            return results
+        objective = self._objective()
+        columns = [points] if levels is None else [points, levels]
+        with _timer(self.profiler)("objective"):
+            if self.executor is not None and len(points) > 1:
+                return list(self.executor.map(objective, *columns))
+            return list(map(objective, *columns))
+
+    """
+    Ask/tell interface, for evaluating points outside of the optimizer:
+        optimizer.start(**optimize_args)
+        while not optimizer.finished:
+            points = optimizer.ask()
+            optimizer.tell([evaluate(point) for point in points])
+    Every point in a call to ask() is independent of the others, so they can be evaluated
+    concurrently. Results are told back in the same order. With a fidelity, points are
+    to be evaluated at self.level (None for full fidelity, or a list with the level of
+    each point).
+    """
+    def start(self, *args, **kwargs):
+        self.state = None
+        self._begin(args, kwargs)
+
+    def _begin(self, args, kwargs):
+        self._arguments = (args, kwargs)
+        self._search_steps = self._search(*args, **kwargs)
+        self.finished = False
+        self.paused = False
+        self.stop_reason = None
+        self._improved_at = self.evaluations
+        self._started = time.time()
+        self.level = None
+        if self.profiler is not None:
+            self.profiler.start()
+        self._advance(None)
+
+    """
+    The points to evaluate next, starting the search with its default arguments if it
+    was never started. Nothing once it has finished (or paused).
+    """
+    def ask(self):
+        if self._search_steps is None:
+            if self.finished or self.paused:
+                return []
+            self.start()
+        return list(self._pending)
+
+    def tell(self, results):
+        if self._search_steps is None:
+            raise RuntimeError("tell() without a running search (finished: {}, paused: {})".format(
+                self.finished, self.paused))
+        results = list(results)
+        assert(len(results) == len(self._pending))
+        self._count(self._pending, results, self.level)
+        self._advance(results)
+
+    """
+    Count evaluations, made at levels as for _levels(). Only full fidelity evaluations
+    count as evaluations or can be the best.
+    """
+    def _count(self, points, results, levels=None):
+        if self.fidelity is not None:
+            levels = _levels(levels, len(points))
+            self.fidelity.record(points, results, levels or [None] * len(points))
+            if levels is not None:
+                full = [i for i, level in enumerate(levels) if level is None]
+                points, results = [points[i] for i in full], [results[i] for i in full]
+        self.evaluations += len(results)
+        if results:
+            best = min(results)
+            if best < self.best_error:
+                if self.best_error - best > self.stopping.get("tolerance", 0) * abs(self.best_error):
+                    self._improved_at = self.evaluations
+                self.best_error = best
+                self.best_point = tuple(points[results.index(best)])
+                if self.profiler is not None:
+                    self.profiler.improvement(self.best_point, best, self.evaluations)
+
+    def _advance(self, results):
+        try:
+            with _timer(self.profiler)("search"):
+                self._pending = self._search_steps.send(results)
+        except StopIteration:
+            self._pending = []
+            self._search_steps = None
+            self._end()
+
+    """
+    The search has returned, finished or paused
+    """
+    def _end(self):
+        self.finished = not self.paused
+        self._write_back()
+        if self.finished and self.stop_reason is None:
+            self.stop_reason = "budget"
+        if self.history is not None:
+            self.history.flush()
+        if self.cache is not None:
+            self.cache.flush()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.finished and self.shared is not None:
+            self.shared.close()
+
+    """
+    Set the Parameters the Optimization was given to the values of its own
+    """
+    def _write_back(self):
+        for given, own in self._given:
+            given.value = own.value
+
+    def optimize(self, *args, **kwargs):
+        self.start(*args, **kwargs)
+        return self._drive()
+
+    def _drive(self):
+        while self._search_steps is not None:
+            self.tell(self._run_batch(self.ask()))
+        return self.params
+
+    """
+    Run (start or continue) the search until it is finished, or paused at the end of an
+    itteration once at least evaluations function evaluations have been made in total.
+    The search state stays on the object, so it can be pickled and continued elsewhere.
+    """
+    def run_until(self, evaluations, *args, **kwargs):
+        self.pause_at = evaluations
+        if self.state is None:
+            self.start(*args, **kwargs)
         else:
-            for i in range(len(self.params)):
-                kwargs[self.params[i].name] = params[i]
-        return self.func(**kwargs)
+            self._begin(args, kwargs)
+        self._drive()
+        self.pause_at = None
+        return self.params
+
+    """
+    Start the next search from points found earlier (e.g. EvaluationStore.best()), best
+    first. The searches start from the current parameters, set to the best of them.
+    """
+    def warm_start(self, points):
+        if points:
+            self._tuple_to_params(points[0])
+
+    """
+    Offer a point found elsewhere (e.g. by another island), returns True if taken
+    """
+    def immigrate(self, point, error):
+        return False
+
+    """
+    Checkpoint to path whenever evaluations function evaluations or seconds have passed
+    since the last checkpoint. Checked at the end of every itteration of the search.
+    """
+    def checkpoint_every(self, path, evaluations=None, seconds=None):
+        self.checkpoint_path = path
+        self.checkpoint_evaluations = evaluations
+        self.checkpoint_seconds = seconds
+        self._last_checkpoint = (self.evaluations, time.time())
+
+    """
+    Called by the searches at the end of every itteration, when everything needed to
+    continue is in self.state. Returns True if the search should stop there.
+    """
+    def _iteration(self):
+        if self.profiler is not None:
+            self.profiler.iteration(self)
+        if self.checkpoint_path is not None:
+            evaluations, seconds = self._last_checkpoint
+            if (self.checkpoint_evaluations is not None and
+                    self.evaluations - evaluations >= self.checkpoint_evaluations) or \
+               (self.checkpoint_seconds is not None and
+                    time.time() - seconds >= self.checkpoint_seconds):
+                self.checkpoint(self.checkpoint_path)
+        self.stop_reason = self._should_stop()
+        if self.stop_reason is not None:
+            return True
+        if self.pause_at is not None and self.evaluations >= self.pause_at:
+            self.paused = True
+        return self.paused
+
+    """
+    Stop the search early, at the end of an itteration, once
+        seconds: this much wall-clock time has passed since it was started (or continued)
+        stall: the best error hasn't improved (relatively) by more than tolerance in this
+            many evaluations
+        target: the best error is at or below target
+        spread: the population (SCE) has collapsed to a normalized hypercube volume below this
+    Why the search stopped ends up in self.stop_reason ("budget" if it ran to the end)
+    """
+    def stop_when(self, seconds=None, stall=None, tolerance=0, target=None, spread=None):
+        self.stopping = {"seconds": seconds, "stall": stall, "tolerance": tolerance,
+                         "target": target, "spread": spread}
+
+    def _should_stop(self):
+        if not self.stopping:
+            return None
+        s = self.stopping
+        if s["target"] is not None and self.best_error <= s["target"]:
+            return "target"
+        if s["stall"] is not None and self.evaluations - self._improved_at >= s["stall"]:
+            return "stall"
+        if s["seconds"] is not None and time.time() - self._started >= s["seconds"]:
+            return "time"
+        if s["spread"] is not None:
+            spread = self._spread()
+            if spread is not None and spread < s["spread"]:
+                return "spread"
+        return None
+
+    """
+    Normalized volume of the search's population, for optimizers that have one
+    """
+    def _spread(self):
+        return None
 
-    def optimize(self):
-        raise ImplementationError("\"optimize\" needs to be implemented")
+    """
+    Atomically write everything needed to continue the search (its state, the random
+    stream, the current parameters, the optimize arguments and the surrogate's archive)
+    to path
+    """
+    def checkpoint(self, path):
+        data = {
+            "class": type(self).__name__,
+            "params": list(zip(self.space.names, self.space.mins, self.space.maxs)),
+            "values": self._params_to_tuple(),
+            "error": self.error,
+            "evaluations": self.evaluations,
+            "best": (self.best_point, self.best_error),
+            "arguments": self._arguments,
+            "state": self.state,
+            "random": self.random.getstate(),
+            "surrogate": None if self.surrogate is None else dict(vars(self.surrogate)),
+        }
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+        self._last_checkpoint = (self.evaluations, time.time())
+
+    """
+    Load a checkpoint and continue its search, through ask/tell or _drive()
+    """
+    def restore(self, path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        assert(data["class"] == type(self).__name__)
+        assert(data["params"] == list(zip(self.space.names, self.space.mins, self.space.maxs)))
+        self._tuple_to_params(data["values"])
+        self.error = data["error"]
+        self.evaluations = data["evaluations"]
+        self.best_point, self.best_error = data["best"]
+        self.random.setstate(data["random"])
+        self.state = data["state"]
+        if self.surrogate is not None and data.get("surrogate") is not None:
+            vars(self.surrogate).update(data["surrogate"])
+        self._begin(*data["arguments"])
+
+    """
+    Continue an optimization from a checkpoint, as if it was never interrupted
+    """
+    def resume(self, path):
+        self.restore(path)
+        return self._drive()
+
+    """
+    Drive the optimizer from asyncio. func may be a coroutine function (e.g. a request to
+    a model server); up to concurrency evaluations of each ask() are awaited at once.
+    Optimizers only ask for several points at a time if they have them (DDS candidates,
+    SCE complexes, full gradients), so concurrency beyond that has no effect.
+    """
+    async def optimize_async(self, *args, concurrency=4, **kwargs):
+        semaphore = asyncio.Semaphore(concurrency)
+        self.start(*args, **kwargs)
+        while self._search_steps is not None:
+            self.tell(await self._run_batch_async(self.ask(), semaphore))
+        return self.params
+
+    async def _run_batch_async(self, points, semaphore):
+        levels = _levels(self.level, len(points))
+        results, missing = self._from_cache(points, levels)
+        if missing:
+            unique = [points[locs[0]] for locs in missing]
+            unique_levels = [None] * len(unique) if levels is None else \
+                            [levels[locs[0]] for locs in missing]
+            with _timer(self.profiler)("objective"):
+                if self.batch:
+                    evaluated = [None] * len(unique)
+                    for level, locs in _by_level(unique_levels):
+                        kwargs = {} if level is None else {"fidelity": level}
+                        async with semaphore:
+                            values = list(await self._await(
+                                self.func([list(unique[i]) for i in locs], **kwargs)))
+                        assert(len(values) == len(locs))
+                        for i, result in zip(locs, values):
+                            evaluated[i] = result
+                else:
+                    objective = self._objective()
+                    evaluated = await asyncio.gather(
+                        *[self._evaluate_async(objective, point, semaphore, level)
+                          for point, level in zip(unique, unique_levels)])
+            self._store(points, results, missing, list(evaluated), levels)
+        return results
+
+    async def _evaluate_async(self, objective, point, semaphore, level=None):
+        async with semaphore:
+            return await self._await(objective(point, level))
+
+    async def _await(self, result):
+        # Plain functions are allowed too, their result is used as is
+        if inspect.isawaitable(result):
+            return await result
+        return result
+
+    """
+    Successive halving of candidates down to the best n at the lower fidelities (see
+    multi_fidelity.py), for use with yield from in _search. Returns the survivors.
+    """
+    def _screen(self, candidates, n):
+        phase = self.phase
+        self.phase = "screening"
+        screening = self.fidelity.screen(candidates, n)
+        try:
+            self.level, points = next(screening)
+            while True:
+                self.level, points = screening.send((yield points))
+        except StopIteration as e:
+            survivors = e.value
+        self.phase, self.level = phase, None
+        return survivors
+
+    """
+    The optimization itself, a generator that yields lists of points to be evaluated
+    and is sent back their results
+    """
+    def _search(self):
+        raise NotImplementedError("\"_search\" needs to be implemented")
 
 
 if __name__ == "__main__":
@@ -98,3 +775,48 @@ if __name__ == "__main__":
     assert(p3.value == -4.5)
     o = Optimization(lambda **kwargs: 1, [p1, p2, p3])
     assert(1 == o._run())
+    o = Optimization(lambda points: [sum(p) for p in points], [p1, p2, p3], batch=True)
+    assert(o._run_batch([(1, 2, 3), (0, 0, 0)]) == [6, 0])
+    assert(o._run() == p1.value + p2.value + p3.value)
+    o = Optimization(lambda one, three, two: one, [p1, p2, p3], call="positional")
+    assert(o._run((1, 2, 3)) == 1)
+    assert(o.space.valid((1, -10, 1)) and not o.space.valid((1, -11, 1)))
+    assert(o.space.clip((2, -11, 0)) == [1, -10, 0])
+    assert(o.space.reflect((1.5, -11, 0)) == [0.5, -9, 0])
+    point = [1.5, -11, 0]
+    o.space.reflect_at(point, [1])
+    assert(point == [1.5, -9, 0])
+    o.params[0].value = 0.25
+    assert(o.space.values[0] == 0.25 and p1.value == 0.5)
+    try:
+        o.optimize()
+        assert(False)
+    except NotImplementedError:
+        pass
+
+    import dynamically_dimensioned_search as dds
+    o = dds.DynamicallyDimensionedSearch(lambda **kwargs: sum(kwargs.values()), [p1, p2, p3])
+    o.start(m=5)
+    while not o.finished:
+        o.tell([sum(point) for point in o.ask()])
+    assert(o.ask() == [] and o.finished and o.evaluations == 5)
+    try:
+        o.tell([0])
+        assert(False)
+    except RuntimeError:
+        pass
+
+    # Optimizers built from the same Parameters don't share them
+    import gradient_descent as gd
+    import shuffled_complex_evolution as sce
+    shared = [Parameter("x", -10, 10, 5), Parameter("y", -10, 10, 5)]
+    square = lambda x, y: (x - 1)**2 + (y - 1)**2
+    o1 = dds.DynamicallyDimensionedSearch(square, shared, seed=1)
+    o2 = sce.ShuffledComplexEvolution(square, shared, seed=1)
+    o3 = gd.GradientDescent(square, shared)
+    values = [p.value for p in o1.optimize()]
+    assert(values == list(o1.space.point()) != [5, 5])
+    assert([p.value for p in shared] == values and str(o1).endswith("y: {}".format(values[1])))
+    assert(o2.space.point() == o3.space.point() == (5, 5))
+    o3.optimize()
+    assert(o3.error < 0.1 and o3._params_to_tuple() == tuple([p.value for p in shared]))
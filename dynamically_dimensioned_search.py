@@ -11,7 +11,6 @@ This algorithm is written from
     Authors: Bryan A. Tolson and Christine A. Shoemaker
 """
 
-import random
 import math
 
 import black_box_optimization as bbo
@@ -20,59 +19,105 @@ class DynamicallyDimensionedSearch(bbo.Optimization):
 
     """
     args:
-        m: number of itterations
+        m: number of itterations (function evaluations)
         r: radius for variable perturbing
+        candidates: number of perturbed candidates generated (and evaluated together,
+            see the executor argument of Optimization) each itteration, the best is kept
+    With a surrogate, surrogate.screen times as many perturbations are generated and
+    only the candidates it predicts to be best are evaluated. With a fidelity, the
+    candidates are the survivors of fidelity.candidates() perturbations screened at
+    the lower fidelities.
     """
-    def optimize(self, m=1000, r=0.2):
-        # Make an initial evalutation
-        best_solution = self._run()
-        self.error = best_solution
-        prev_params = self._params_to_tuple()
-        curr_params = list(prev_params)
+    def _search(self, m=1000, r=0.2, candidates=1):
+        s = self.state
+        if s is None:
+            # Make an initial evalutation
+            self.phase = "initial"
+            best_solution = (yield [self._params_to_tuple()])[0]
+            s = self.state = {
+                "best_solution": best_solution,
+                "prev_params": self._params_to_tuple(),
+                "evaluations": 1,
+            }
+            self.error = best_solution
 
         # For every itteration
-        for i in range(m - 1):
-            # Calculate the probability each parameter will be perturbed
-            p_included = 1 - math.log(i + 1) / math.log(m)
-            # Perturb parameters
-            for j, p in enumerate(self.params):
-                # At least one parameter has to be changed
-                at_least_one = True
-                while (at_least_one):
-                    # Determine if it is to be perturbed
-                    if random.random() < p_included:
-                        at_least_one = False
-                        # Calculate the change
-                        value = curr_params[j]
-                        value += random.gauss(0, 1) * r * (p.max - p.min)
-                        # Reflect at variable boundaries
-                        if value > p.max:
-                            value = p.max - (value - p.max)
-                            if value < p.min:
-                                value = p.max
-                        elif value < p.min:
-                            value = p.min + (p.min - value)
-                            if value > p.max:
-                                value = p.min
-
-                        curr_params[j] = value
-
-            # Get the solution at the changed parameters
-            solution = self._run(curr_params)
-            if solution > best_solution: # Worse, restore parameters
-                curr_params = list(prev_params)
-            else: # Better, keep parameters
-                best_solution = solution
-                prev_params = tuple(curr_params)
-
-        self.error = best_solution
-        self._tuple_to_params(curr_params)
-
-        return self.params
-
-
-def run(func, params, itterations=1000, **kwargs):
-    optimizer = DynamicallyDimensionedSearch(func, params)
+        self.phase = "perturbation"
+        timed = bbo._timer(self.profiler)
+        while s["evaluations"] < m:
+            # Calculate the probability each parameter will be perturbed,
+            #   the schedule is over evaluations so any number of candidates uses the same budget
+            p_included = 1 - math.log(s["evaluations"]) / math.log(m)
+            n = min(candidates, m - s["evaluations"])
+            count = n if self.fidelity is None else self.fidelity.candidates(n)
+            with timed("perturb"):
+                if self.surrogate is not None and self.surrogate.ready():
+                    batch = self.surrogate.best(
+                        [self._perturb(s["prev_params"], p_included, r)
+                         for k in range(count * self.surrogate.screen)], count)
+                else:
+                    batch = [self._perturb(s["prev_params"], p_included, r) for k in range(count)]
+            if self.fidelity is not None:
+                batch = yield from self._screen(batch, n)
+
+            # Get the solutions at the changed parameters
+            solutions = yield batch
+            s["evaluations"] += len(batch)
+            solution = min(solutions)
+            if solution <= s["best_solution"]: # Better, keep parameters
+                s["best_solution"] = solution
+                s["prev_params"] = tuple(batch[solutions.index(solution)])
+            if self._iteration():
+                break
+
+        self.error = s["best_solution"]
+        self._tuple_to_params(s["prev_params"])
+
+    def immigrate(self, point, error):
+        s = self.state
+        if s is None or error >= s["best_solution"]:
+            return False
+        s["best_solution"] = error
+        s["prev_params"] = tuple(point)
+        return True
+
+    """
+    Perturb a random subset of the dimensions of prev_params, each one included with
+    probability p_included (at least one always is). The included dimensions are found
+    by skipping ahead geometrically, so the cost is in the number perturbed rather than
+    the number of dimensions.
+    """
+    def _perturb(self, prev_params, p_included, r):
+        n = len(self.space)
+        dims = []
+        if p_included >= 1:
+            dims = list(range(n))
+        elif p_included > 0:
+            log_excluded = math.log(1 - p_included)
+            j = int(math.log(1 - self.random.random()) / log_excluded)
+            while j < n:
+                dims.append(j)
+                j += 1 + int(math.log(1 - self.random.random()) / log_excluded)
+        if not dims:
+            dims = [self.random.randrange(n)]
+
+        # Calculate the change and reflect at variable boundaries
+        curr_params = list(prev_params)
+        mins, maxs = self.space.mins, self.space.maxs
+        for j in dims:
+            curr_params[j] += self.random.gauss(0, 1) * r * (maxs[j] - mins[j])
+        self.space.reflect_at(curr_params, dims)
+        return curr_params
+
+
+"""
+With a store (EvaluationStore), reuse its evaluations and start from its best point
+of warm_version (by default its own version, or the latest earlier one with any)
+"""
+def run(func, params, itterations=1000, store=None, warm_version=None, **kwargs):
+    optimizer = DynamicallyDimensionedSearch(func, params, cache=store)
+    if store is not None:
+        optimizer.warm_start(store.warm(1, warm_version))
     optimizer.optimize(m=itterations, **kwargs)
     return optimizer
 
@@ -86,3 +131,15 @@ if __name__ == "__main__":
             { "name": "jim", "min": -100.5, "max": -50, "value": -70}
         ]
     print(run(function_to_minimize, parameters))
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        optimizer = DynamicallyDimensionedSearch(function_to_minimize, parameters, executor=executor)
+        optimizer.optimize(candidates=4)
+        print(optimizer)
+
+    optimizer = DynamicallyDimensionedSearch(function_to_minimize, parameters)
+    optimizer.start(m=100, candidates=2)
+    while not optimizer.finished:
+        points = optimizer.ask()
+        optimizer.tell([sum(point) for point in points])
+    print(optimizer)
@@ -0,0 +1,350 @@
+"""
+Evaluation over TCP, spread over workers on any number of machines.
+
+The Broker stands in for func, and is the executor that runs evaluations in parallel:
+    with Broker(port=5555) as broker:
+        ShuffledComplexEvolution(broker, params, executor=broker).optimize()
+while every worker runs the real function:
+    Worker(func, "broker-host", 5555).run()
+
+Workers register, then pull one evaluation at a time (the arguments func was called
+with), and send back its result, heartbeating while they work. A worker that
+disconnects or misses heartbeats for heartbeat_timeout seconds is dropped and its
+evaluation goes back to the front of the queue for another worker. Results of the
+same evaluation arriving late are ignored, so the optimizers see exactly one result
+per evaluation and runs repeat whatever workers come and go.
+
+Messages are lines of JSON:
+    worker: {"type": "register", "name": ...}
+    worker: {"type": "pull"}
+    broker: {"type": "task", "id": ..., "args": [...], "kwargs": {...}}
+    worker: {"type": "heartbeat"} (any number of times)
+    worker: {"type": "result", "id": ..., "result": ...} (or "error" with a "message")
+"""
+
+import collections
+import concurrent.futures
+import itertools
+import json
+import socket
+import threading
+import time
+
+
+def _connected(connection):
+    # Messages are small and answered right away, don't hold them back (Nagle)
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection.makefile("rwb")
+
+
+def _send(stream, message):
+    stream.write((json.dumps(message) + "\n").encode())
+    stream.flush()
+
+
+def _receive(stream):
+    line = stream.readline()
+    if not line:
+        raise EOFError("connection closed")
+    return json.loads(line)
+
+
+class RemoteError(Exception):
+    pass
+
+
+class _Task():
+
+    def __init__(self, id, args, kwargs):
+        self.id = id
+        self.args = args
+        self.kwargs = kwargs
+        self.future = concurrent.futures.Future()
+
+
+class _WorkerRecord():
+
+    def __init__(self, name, address):
+        self.name = name
+        self.address = address
+        self.connected = time.time()
+        self.disconnected = None
+        self.evaluations = 0
+        self.busy = 0 # Seconds spent evaluating (including the round trip)
+        self.reassigned = 0 # Evaluations taken back from it
+
+    def statistics(self):
+        seconds = (self.disconnected or time.time()) - self.connected
+        return {"name": self.name, "address": self.address, "alive": self.disconnected is None,
+                "evaluations": self.evaluations, "seconds": seconds, "busy": self.busy,
+                "throughput": self.evaluations / seconds if seconds else 0,
+                "utilization": self.busy / seconds if seconds else 0,
+                "reassigned": self.reassigned}
+
+
+class Broker():
+
+    """
+    args:
+        host, port: address to listen on (port 0 picks a free one, see self.address)
+        heartbeat_timeout: seconds without a message from a busy worker before it is
+            considered dead
+        concurrency: most evaluations waiting at once through map() and submit()
+    """
+    def __init__(self, host="127.0.0.1", port=0, heartbeat_timeout=10, concurrency=256):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.workers = []
+        self._tasks = collections.deque()
+        self._held = set() # Tasks being evaluated by a worker
+        self._condition = threading.Condition()
+        self._ids = itertools.count()
+        self._closed = False
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()
+        self._executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __str__(self):
+        return "\n".join(["{name} ({address[0]}:{address[1]}): {evaluations} evaluations, "
+                          "{throughput:.2f}/s, {utilization:.0%} busy, {reassigned} reassigned"
+                          "{dead}".format(dead="" if s["alive"] else ", gone", **s)
+                          for s in self.statistics()])
+
+    """
+    Evaluate func(*args, **kwargs) on a worker, waiting for the result
+    """
+    def __call__(self, *args, **kwargs):
+        task = _Task(next(self._ids), args, kwargs)
+        with self._condition:
+            if self._closed:
+                raise RemoteError("broker closed")
+            self._tasks.append(task)
+            self._condition.notify()
+        return task.future.result()
+
+    """
+    Executor interface, runs fn (usually the Objective wrapping this broker) with the
+    evaluations it makes waiting on the workers at the same time
+    """
+    def map(self, fn, *iterables):
+        return self._executor.map(fn, *iterables)
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(fn, *args, **kwargs)
+
+    """
+    Per worker: evaluations, evaluations per second connected, share of the time it
+    was evaluating, and evaluations taken back from it when it died
+    """
+    def statistics(self):
+        return [worker.statistics() for worker in self.workers]
+
+    """
+    Stop serving, evaluations still waiting for a result fail with a RemoteError
+    """
+    def close(self):
+        with self._condition:
+            self._closed = True
+            for task in list(self._tasks) + list(self._held):
+                if not task.future.done():
+                    task.future.set_exception(RemoteError("broker closed"))
+            self._tasks.clear()
+            self._held.clear()
+            self._condition.notify_all()
+        self._server.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _accept(self):
+        while True:
+            try:
+                connection, address = self._server.accept()
+            except OSError: # Closed
+                return
+            threading.Thread(target=self._serve, args=(connection, address), daemon=True).start()
+
+    def _next_task(self):
+        with self._condition:
+            while not self._tasks and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                return None
+            task = self._tasks.popleft()
+            self._held.add(task)
+            return task
+
+    def _serve(self, connection, address):
+        stream = _connected(connection)
+        worker = None
+        task = None
+        try:
+            message = _receive(stream)
+            assert(message["type"] == "register")
+            worker = _WorkerRecord(message.get("name") or "{}:{}".format(*address), address)
+            self.workers.append(worker)
+            while True:
+                # No timeout while idle, the worker isn't holding anything
+                connection.settimeout(None if task is None else self.heartbeat_timeout)
+                message = _receive(stream)
+                if message["type"] == "pull":
+                    task = self._next_task()
+                    if task is None:
+                        return
+                    started = time.time()
+                    _send(stream, {"type": "task", "id": task.id, "args": task.args,
+                                   "kwargs": task.kwargs})
+                elif message["type"] in ("result", "error") and task is not None and \
+                        message["id"] == task.id:
+                    if not task.future.done():
+                        if message["type"] == "result":
+                            task.future.set_result(message["result"])
+                        else:
+                            task.future.set_exception(RemoteError(message["message"]))
+                    worker.evaluations += 1
+                    worker.busy += time.time() - started
+                    with self._condition:
+                        self._held.discard(task)
+                    task = None
+        except (OSError, EOFError, ValueError, AssertionError):
+            pass # Dead (or timed out) worker
+        finally:
+            if task is not None:
+                with self._condition:
+                    self._held.discard(task)
+                    if not task.future.done() and not self._closed:
+                        # Back to the front of the queue
+                        self._tasks.appendleft(task)
+                        self._condition.notify()
+                        worker.reassigned += 1
+            if worker is not None:
+                worker.disconnected = time.time()
+            connection.close()
+
+
+class Worker():
+
+    """
+    args:
+        func: the function to minimize, called like the optimizer would call it
+        host, port: address of the broker
+        name: shown in the broker's statistics (defaults to the worker's address)
+        heartbeat: seconds between heartbeats while evaluating, well below the broker's
+            heartbeat_timeout
+    """
+    def __init__(self, func, host, port, name=None, heartbeat=1):
+        self.func = func
+        self.address = (host, port)
+        self.name = name
+        self.heartbeat = heartbeat
+        self.evaluations = 0
+
+    """
+    Evaluate for the broker until it closes the connection
+    """
+    def run(self):
+        connection = socket.create_connection(self.address)
+        stream = _connected(connection)
+        lock = threading.Lock()
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.wait(self.heartbeat):
+                try:
+                    with lock:
+                        _send(stream, {"type": "heartbeat"})
+                except OSError:
+                    return
+
+        try:
+            _send(stream, {"type": "register", "name": self.name})
+            threading.Thread(target=heartbeat, daemon=True).start()
+            while True:
+                with lock:
+                    _send(stream, {"type": "pull"})
+                task = _receive(stream)
+                try:
+                    message = {"type": "result", "id": task["id"],
+                               "result": self.func(*task["args"], **task["kwargs"])}
+                except Exception as e:
+                    message = {"type": "error", "id": task["id"], "message": repr(e)}
+                with lock:
+                    _send(stream, message)
+                self.evaluations += 1
+        except (OSError, EOFError):
+            pass # Broker gone
+        finally:
+            stopped.set()
+            connection.close()
+
+
+def _run_worker(host, port, name, die_after=None):
+    def func(**kwargs):
+        if die_after is not None and worker.evaluations >= die_after:
+            import os
+            os._exit(1)
+        time.sleep(0.001)
+        return sum(kwargs.values())
+    worker = Worker(func, host, port, name=name, heartbeat=0.1)
+    worker.run()
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import multiprocessing
+    import os
+    import signal
+    import dynamically_dimensioned_search as dds
+    import gradient_descent as gd
+    import shuffled_complex_evolution as sce
+    function_to_minimize = lambda **kwargs: sum(kwargs.values())
+    parameters = [{"name": str(i), "min": -i - 1, "max": i + 1} for i in range(6)]
+    with Broker(heartbeat_timeout=1) as broker:
+        host, port = broker.address
+        workers = [multiprocessing.Process(target=_run_worker, args=(host, port, "worker {}".format(i)))
+                   for i in range(3)]
+        workers.append(multiprocessing.Process(target=_run_worker, args=(host, port, "crashes", 20)))
+        workers.append(multiprocessing.Process(target=_run_worker, args=(host, port, "freezes")))
+        for process in workers:
+            process.start()
+
+        tests = [(dds.DynamicallyDimensionedSearch, {"candidates": 4}),
+                 (dds.DynamicallyDimensionedSearch, {}),
+                 (sce.ShuffledComplexEvolution, {}),
+                 (gd.GradientDescent, {"gradient": "central"})]
+        for i, (optimization, kwargs) in enumerate(tests):
+            if i == 1:
+                os.kill(workers[-1].pid, signal.SIGSTOP) # Stops heartbeating mid evaluation
+            optimizer = optimization(broker, parameters, executor=broker, seed=1)
+            optimizer.optimize(300, **kwargs)
+            expected = optimization(function_to_minimize, parameters, seed=1)
+            expected.optimize(300, **kwargs)
+            assert(optimizer.error == expected.error)
+            assert(optimizer.evaluations == expected.evaluations)
+        print(broker)
+        statistics = {s["name"]: s for s in broker.statistics()}
+        assert(not statistics["crashes"]["alive"])
+        assert(sum([s["evaluations"] for s in statistics.values()]) >= 4 * 300 - 10)
+    os.kill(workers[-1].pid, signal.SIGKILL)
+    for process in workers:
+        process.join()
+
+    # Closing fails whatever is still waiting, instead of leaving it blocked
+    broker = Broker()
+    future = broker.submit(broker, x=1)
+    time.sleep(0.1)
+    broker.close()
+    try:
+        future.result(timeout=5)
+        assert(False)
+    except RemoteError:
+        pass
+    try:
+        broker(x=1)
+        assert(False)
+    except RemoteError:
+        pass
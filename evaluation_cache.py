@@ -0,0 +1,112 @@
+"""
+Memoization of objective evaluations so no optimizer pays twice for the same point.
+
+Points are matched exactly, or after rounding every value to a tolerance relative
+to its parameter's range. Entries are evicted least recently used first once the
+entry count or (approximate) memory cap is reached.
+"""
+
+import collections
+import sys
+
+
+class EvaluationCache():
+
+    """
+    args:
+        max_entries: maximum number of cached evaluations (None for no limit)
+        max_bytes: approximate maximum memory used by the cache (None for no limit)
+        tolerance: points whose values agree to within tolerance * (max - min) of
+            each parameter share an entry, 0 for exact matching
+    """
+    def __init__(self, max_entries=None, max_bytes=None, tolerance=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.steps = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return "entries: {}, hits: {}, misses: {}, evictions: {}".format(
+            len(self), self.hits, self.misses, self.evictions)
+
+    """
+    Called by the Optimization so tolerances can be scaled to the parameter ranges
+    """
+    def bind(self, params):
+        if self.tolerance:
+            self.steps = [self.tolerance * (p.max - p.min) for p in params]
+
+    def key(self, point):
+        if not self.steps:
+            return tuple(point)
+        return tuple([round(v / s) if s else v for v, s in zip(point, self.steps)])
+
+    def get(self, point, default=None):
+        key = self.key(point)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, point, result):
+        key = self.key(point)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        else:
+            self.bytes += self._size(key)
+        self.entries[key] = result
+        while self.entries and (
+                (self.max_entries is not None and len(self.entries) > self.max_entries) or
+                (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            key, __ = self.entries.popitem(last=False)
+            self.bytes -= self._size(key)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def flush(self):
+        pass # Nothing kept anywhere else (see evaluation_store.py)
+
+    def _size(self, key):
+        # Key tuple and its numbers, the result and the dict slot
+        return sys.getsizeof(key) + 24 * len(key) + 24 + 100
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import black_box_optimization as bbo
+    cache = EvaluationCache(max_entries=2)
+    cache.put((1, 2), 3)
+    cache.put((2, 3), 5)
+    assert(cache.get((1, 2)) == 3)
+    cache.put((3, 4), 7) # Evicts (2, 3), the least recently used
+    assert(cache.get((2, 3)) is None)
+    assert(cache.get((1, 2)) == 3)
+    assert(cache.hits == 2 and cache.misses == 1 and cache.evictions == 1)
+
+    cache = EvaluationCache(tolerance=0.01)
+    cache.bind([bbo.Parameter("a", 0, 10)])
+    cache.put((5.0,), 1)
+    assert(cache.get((5.04,)) == 1)
+    assert(cache.get((5.2,)) is None)
+
+    calls = []
+    def function_to_minimize(**kwargs):
+        calls.append(kwargs)
+        return sum(kwargs.values())
+    o = bbo.Optimization(function_to_minimize, [bbo.Parameter("a", 0, 10)], cache=EvaluationCache())
+    assert(o._run_batch([(1,), (2,), (1,)]) == [1, 2, 1])
+    assert(o._run((2,)) == 2)
+    assert(len(calls) == 2)
@@ -0,0 +1,197 @@
+"""
+Append-only record of every evaluation an optimizer makes, for post-hoc analysis of
+runs with millions of evaluations.
+
+A history is a directory of fixed-width columns, each its own raw little-endian file:
+    params: float64 x number of parameters per record
+    error: float64
+    time: float64, seconds since the epoch
+    phase: uint8, index into the phases in meta.json
+Records are only appended, so a reader can memory-map the columns while the run is
+still going; the number of complete records is the shortest column.
+"""
+
+import array
+import json
+import mmap
+import os
+import sys
+import time
+
+
+COLUMNS = {"params": "d", "error": "d", "time": "d", "phase": "B"}
+
+
+class HistoryRecorder():
+
+    """
+    args:
+        directory: where the columns are written (created if needed, appended to if it
+            already holds a history of the same parameters)
+        buffer_size: records held in memory before they are written out
+    """
+    def __init__(self, directory, buffer_size=4096):
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.names = None
+        self.phases = []
+        self.buffers = {column: array.array(typecode) for column, typecode in COLUMNS.items()}
+        self.buffered = 0
+        self.records = 0
+
+    """
+    Called by the Optimization with the parameter names, in the order of each point
+    """
+    def bind(self, names):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = _read_meta(self.directory)
+        if meta is not None:
+            assert(meta["names"] == list(names))
+            self.phases = meta["phases"]
+        self.names = list(names)
+        self._write_meta()
+
+    def record(self, points, results, phases=None):
+        now = time.time()
+        for i, (point, result) in enumerate(zip(points, results)):
+            phase = phases[i] if isinstance(phases, list) else phases
+            if phase not in self.phases:
+                assert(len(self.phases) < 256)
+                self.phases.append(phase)
+                self._write_meta()
+            self.buffers["params"].extend(point)
+            self.buffers["error"].append(result)
+            self.buffers["time"].append(now)
+            self.buffers["phase"].append(self.phases.index(phase))
+            self.buffered += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        # Params go first, so a reader never sees an error without its point
+        for column in ("params", "error", "time", "phase"):
+            buffer = self.buffers[column]
+            if sys.byteorder != "little":
+                buffer.byteswap()
+            with open(os.path.join(self.directory, column), "ab") as f:
+                buffer.tofile(f)
+            del buffer[:]
+        self.records += self.buffered
+        self.buffered = 0
+
+    def _write_meta(self):
+        path = os.path.join(self.directory, "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"names": self.names, "phases": self.phases}, f)
+        os.replace(path + ".tmp", path)
+
+
+def _read_meta(directory):
+    path = os.path.join(directory, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class History():
+
+    """
+    Read-only, zero-copy view of a history (possibly still being written). Columns are
+    memoryviews over memory maps of the files, params is 2D (records x parameters) once
+    there are records (flat and empty before). Call refresh() to see records appended
+    since.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.maps = []
+        self.refresh()
+
+    def refresh(self):
+        self.close()
+        meta = _read_meta(self.directory)
+        self.names = meta["names"]
+        self.phases = meta["phases"]
+        widths = {"params": 8 * len(self.names), "error": 8, "time": 8, "phase": 1}
+        sizes = {}
+        for column in COLUMNS:
+            path = os.path.join(self.directory, column)
+            sizes[column] = os.path.getsize(path) if os.path.exists(path) else 0
+        self.length = min([sizes[column] // widths[column] for column in COLUMNS])
+
+        for column, typecode in COLUMNS.items():
+            view = memoryview(b"")
+            if self.length:
+                with open(os.path.join(self.directory, column), "rb") as f:
+                    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.maps.append(m)
+                view = memoryview(m)[:self.length * widths[column]]
+            view = view.cast(typecode)
+            if column == "params":
+                self.flat_params = view
+                if self.length: # Memoryviews can't have a 0 in their shape
+                    view = view.cast("B").cast(typecode, shape=[self.length, len(self.names)])
+            setattr(self, column, view)
+
+    def __len__(self):
+        return self.length
+
+    def point(self, i):
+        n = len(self.names)
+        return tuple(self.flat_params[i * n:(i + 1) * n])
+
+    def phase_names(self):
+        return [self.phases[i] for i in self.phase]
+
+    """
+    The columns as numpy arrays, still backed by the memory maps (requires numpy)
+    """
+    def to_numpy(self):
+        import numpy
+        return {column: numpy.asarray(getattr(self, column)) for column in COLUMNS}
+
+    def close(self):
+        for column in list(COLUMNS) + ["flat_params"]:
+            if hasattr(self, column):
+                getattr(self, column).release()
+        for m in self.maps:
+            m.close()
+        self.maps = []
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import tempfile
+    import dynamically_dimensioned_search as dds
+    with tempfile.TemporaryDirectory() as directory:
+        # Read while the run is going, before and after the first records are written
+        recorder = HistoryRecorder(directory, buffer_size=10)
+        optimizer = dds.DynamicallyDimensionedSearch(
+            lambda **kwargs: sum(kwargs.values()),
+            [{"name": "bob", "min": 0, "max": 100}, {"name": "jim", "min": -100.5, "max": -50}],
+            history=recorder)
+        optimizer.start(m=25)
+        history = History(directory)
+        assert(len(history) == 0 and len(history.params) == 0 and history.phase_names() == [])
+        while optimizer.evaluations < 15:
+            optimizer.tell(optimizer._run_batch(optimizer.ask()))
+        history.refresh()
+        assert(len(history) == 10 and history.params.shape == (10, 2))
+        assert(history.params[9, 0] == history.point(9)[0])
+        history.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = HistoryRecorder(directory, buffer_size=10)
+        optimizer = dds.DynamicallyDimensionedSearch(
+            lambda **kwargs: sum(kwargs.values()),
+            [{"name": "bob", "min": 0, "max": 100}, {"name": "jim", "min": -100.5, "max": -50}],
+            history=recorder)
+        optimizer.optimize(m=95)
+        history = History(directory)
+        assert(len(history) == 95)
+        assert(history.names == ["bob", "jim"])
+        assert(history.phase_names()[:2] == ["initial", "perturbation"])
+        assert(min(history.error) == optimizer.error)
+        assert(sum(history.point(0)) == history.error[0])
+        assert(history.params[0, 1] == history.point(0)[1])
+        history.close()
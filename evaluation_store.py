@@ -0,0 +1,307 @@
+"""
+Evaluations kept on disk across runs, so a new run can start from the best points of
+earlier ones and never pays again for a point already evaluated.
+
+An EvaluationStore is an SQLite file holding the evaluations of any number of
+problems, each identified by its signature: the parameter names and bounds and a
+data version supplied by the user. Given to an Optimization as its cache, it answers
+exact matches of the same problem from the file and records every new evaluation.
+Evaluations of other data versions are never reused as results, but their best
+points make good starting points:
+
+    store = EvaluationStore("calibration.sqlite", version="2026-10-12")
+    optimizer = ShuffledComplexEvolution(func, params, cache=store)
+    optimizer.warm_start([point for point, error in store.best(10, version="2026-10-05")])
+    optimizer.optimize()
+
+Locations are indexed with an R*Tree (over the first few normalized coordinates) for
+nearest point lookups, which fall back to a scan if SQLite was built without it.
+"""
+
+import array
+import json
+import math
+import sqlite3
+import time
+
+
+RTREE_DIMENSIONS = 5 # Most coordinates indexed, SQLite allows 5
+
+
+def _blob(values):
+    return array.array('d', values).tobytes()
+
+
+def _values(blob):
+    return tuple(array.array('d', blob))
+
+
+def _result(value):
+    return float('nan') if value is None else value # SQLite keeps NaN as NULL
+
+
+class EvaluationStore():
+
+    """
+    args:
+        path: the SQLite file (created if needed)
+        version: version of the data the objective uses, evaluations of one version are
+            only reused by the same version
+        tolerance: points whose values agree to within tolerance * (max - min) of
+            each parameter share an entry, 0 for exact matching (as EvaluationCache)
+        commit_every: evaluations recorded between commits, they are also committed
+            at the end of every search
+    """
+    def __init__(self, path, version=None, tolerance=0, commit_every=1000):
+        self.path = path
+        self.version = "" if version is None else str(version)
+        self.tolerance = tolerance
+        self.commit_every = commit_every
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS problems (
+                id INTEGER PRIMARY KEY, parameters TEXT NOT NULL, version TEXT NOT NULL,
+                UNIQUE (parameters, version));
+            CREATE TABLE IF NOT EXISTS evaluations (
+                id INTEGER PRIMARY KEY, problem INTEGER NOT NULL, key BLOB NOT NULL,
+                point BLOB NOT NULL, result REAL, time REAL NOT NULL,
+                UNIQUE (problem, key));
+            CREATE INDEX IF NOT EXISTS ranked ON evaluations (problem, result);
+        """)
+        self.problem = None
+        self.steps = None
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM evaluations WHERE problem = ?", (self.problem,)).fetchone()[0]
+
+    def __str__(self):
+        return "entries: {}, hits: {}, misses: {}".format(len(self), self.hits, self.misses)
+
+    """
+    Called by the Optimization with its parameters, which (with the version) pick the
+    problem the evaluations are stored under
+    """
+    def bind(self, params):
+        self.mins = [p.min for p in params]
+        self.ranges = [(p.max - p.min) or 1 for p in params]
+        if self.tolerance:
+            self.steps = [self.tolerance * (p.max - p.min) for p in params]
+        self.parameters = json.dumps([[p.name, p.min, p.max] for p in params])
+        self.problem = self._problem(self.version, create=True)
+        self.indexed = min(len(params), RTREE_DIMENSIONS)
+        self.rtree = "locations_{}".format(self.problem)
+        try:
+            self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {} USING rtree(id, {})".format(
+                self.rtree, ", ".join(["min{0}, max{0}".format(i) for i in range(self.indexed)])))
+        except sqlite3.OperationalError: # No R*Tree module
+            self.rtree = None
+        self.connection.commit()
+
+    def _problem(self, version, create=False):
+        if create:
+            self.connection.execute("INSERT OR IGNORE INTO problems (parameters, version) VALUES (?, ?)",
+                                    (self.parameters, version))
+        row = self.connection.execute("SELECT id FROM problems WHERE parameters = ? AND version = ?",
+                                      (self.parameters, version)).fetchone()
+        return row and row[0]
+
+    """
+    Data versions with evaluations stored for these parameters
+    """
+    def versions(self):
+        return [version for version, in self.connection.execute(
+            "SELECT version FROM problems WHERE parameters = ? ORDER BY id", (self.parameters,))]
+
+    def key(self, point):
+        if not self.steps:
+            return tuple(point)
+        return tuple([round(v / s) if s else v for v, s in zip(point, self.steps)])
+
+    def get(self, point, default=None):
+        row = self.connection.execute(
+            "SELECT result FROM evaluations WHERE problem = ? AND key = ?",
+            (self.problem, _blob(self.key(point)))).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return _result(row[0])
+
+    def put(self, point, result):
+        key = _blob(self.key(point))
+        row = self.connection.execute("SELECT id FROM evaluations WHERE problem = ? AND key = ?",
+                                      (self.problem, key)).fetchone()
+        if row is not None:
+            self.connection.execute("UPDATE evaluations SET result = ?, time = ? WHERE id = ?",
+                                    (result, time.time(), row[0]))
+        else:
+            cursor = self.connection.execute(
+                "INSERT INTO evaluations (problem, key, point, result, time) VALUES (?, ?, ?, ?, ?)",
+                (self.problem, key, _blob(point), result, time.time()))
+            if self.rtree is not None:
+                x = self._normalize(point)[:self.indexed]
+                self.connection.execute(
+                    "INSERT INTO {} VALUES (?{})".format(self.rtree, ", ?, ?" * self.indexed),
+                    [cursor.lastrowid] + [v for value in x for v in (value, value)])
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def clear(self):
+        if self.rtree is not None:
+            self.connection.execute("DELETE FROM {}".format(self.rtree))
+        self.connection.execute("DELETE FROM evaluations WHERE problem = ?", (self.problem,))
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    """
+    The n best (point, result) of these parameters at version (defaults to the store's
+    own), best first. NaN results are left out.
+    """
+    def best(self, n=1, version=None):
+        problem = self.problem if version is None else self._problem(str(version))
+        return [(_values(point), result) for point, result in self.connection.execute(
+            "SELECT point, result FROM evaluations WHERE problem = ? AND result IS NOT NULL "
+            "ORDER BY result LIMIT ?", (problem, n))]
+
+    """
+    The n best points to start a run from: those of version if given, else of the
+    store's own version, else of the latest earlier version that has any
+    """
+    def warm(self, n=1, version=None):
+        if version is not None:
+            return [point for point, result in self.best(n, version)]
+        for version in [self.version] + self.versions()[::-1]:
+            best = self.best(n, version)
+            if best:
+                return [point for point, result in best]
+        return []
+
+    """
+    The n stored (point, result) closest to point (in coordinates normalized to the
+    parameter ranges), closest first
+    """
+    def nearest(self, point, n=1):
+        x = self._normalize(point)
+        if self.rtree is None:
+            return self._closest(x, self.connection.execute(
+                "SELECT point, result FROM evaluations WHERE problem = ?", (self.problem,)), n)
+        total = len(self)
+        if not total:
+            return []
+        half = (n / total) ** (1 / len(x)) / 2 # Box holding about n uniform points
+        while True:
+            # Anything within distance half of x is in the box, so once the nth closest
+            # found is that close it is the nth closest of all
+            box = [v for value in x[:self.indexed] for v in (value + half, value - half)]
+            rows = self.connection.execute(
+                "SELECT point, result FROM evaluations WHERE id IN (SELECT id FROM {} WHERE {})".format(
+                    self.rtree, " AND ".join(["min{0} <= ? AND max{0} >= ?".format(i)
+                                              for i in range(self.indexed)])), box).fetchall()
+            closest = self._closest(x, rows, n)
+            if len(rows) >= total or (len(closest) == n and
+                                      math.dist(x, self._normalize(closest[-1][0])) <= half):
+                return closest
+            half = 2 * half if len(closest) < n else math.dist(x, self._normalize(closest[-1][0]))
+
+    def _closest(self, x, rows, n):
+        rows = [(_values(point), _result(result)) for point, result in rows]
+        return sorted(rows, key=lambda row: math.dist(x, self._normalize(row[0])))[:n]
+
+    def _normalize(self, point):
+        return [(v - lo) / r for v, lo, r in zip(point, self.mins, self.ranges)]
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import os
+    import random
+    import tempfile
+    import black_box_optimization as bbo
+    import dynamically_dimensioned_search as dds
+    import gradient_descent as gd
+    import shuffled_complex_evolution as sce
+    calls = [0]
+    def function_to_minimize(**kwargs):
+        calls[0] += 1
+        return sum([(v - 1)**2 for v in kwargs.values()])
+    parameters = [{"name": str(i), "min": -5, "max": 5} for i in range(6)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "store.sqlite")
+
+        with EvaluationStore(path, version=1) as store:
+            store.bind([bbo.Parameter(str(i), -5, 5) for i in range(6)])
+            rand = random.Random(1)
+            points = [tuple([rand.uniform(-5, 5) for i in range(6)]) for j in range(2000)]
+            for point in points:
+                store.put(point, sum(point))
+            assert(len(store) == 2000 and store.get(points[5]) == sum(points[5]))
+            for j in range(20):
+                target = [rand.uniform(-5, 5) for i in range(6)]
+                expected = sorted(points, key=lambda point: math.dist(target, point))[:3]
+                assert([point for point, result in store.nearest(target, 3)] == expected)
+            store.put(points[0], float('nan')) # Failed runs
+            assert(math.isnan(store.get(points[0])) and not math.isnan(store.best()[0][1]))
+            store.clear()
+
+        # A first run, then the same problem again reusing its evaluations
+        with EvaluationStore(path, version=1) as store:
+            first = sce.ShuffledComplexEvolution(function_to_minimize, parameters, seed=1, cache=store)
+            first.optimize(itt=500)
+            assert(calls[0] == len(store) == store.misses)
+        calls[0] = 0
+        with EvaluationStore(path, version=1) as store:
+            again = sce.ShuffledComplexEvolution(function_to_minimize, parameters, seed=1, cache=store)
+            again.optimize(itt=500)
+            assert(calls[0] == 0 and again.error == first.error and store.hits == again.evaluations)
+
+        # Parallel runs keep their evaluations too
+        with EvaluationStore(path, version="parallel") as store:
+            parallel = sce.ShuffledComplexEvolution(function_to_minimize, parameters, seed=1,
+                                                    cache=store)
+            parallel.optimize(itt=300, processes=2)
+            assert(len(store) > 0.9 * parallel.evaluations) # Only repeated points missing
+            assert(store.best()[0][1] == parallel.error)
+
+        # New data, warm started from the previous version's best points
+        with EvaluationStore(path, version=2) as store:
+            warm = sce.ShuffledComplexEvolution(function_to_minimize, parameters, seed=2, cache=store)
+            assert(store.versions() == ["1", "parallel", "2"])
+            warm.warm_start([point for point, error in store.best(10, version=1)])
+            warm.optimize(itt=100)
+            cold = sce.ShuffledComplexEvolution(function_to_minimize, parameters, seed=2)
+            cold.optimize(itt=100)
+            print("SCE: {:.3g} warm, {:.3g} cold".format(warm.error, cold.error))
+            assert(warm.error < cold.error)
+
+            best, error = store.best()[0]
+            for run in (dds.run, gd.run):
+                optimizer = run(function_to_minimize, parameters, 20, store=store)
+                assert(optimizer.best_error <= error)
+
+        # A new version starts from the latest one with evaluations
+        with EvaluationStore(path, version=3) as store:
+            optimizer = dds.DynamicallyDimensionedSearch(function_to_minimize, parameters,
+                                                         cache=store)
+            assert(store.warm() == [point for point, result in store.best(1, version=2)])
+            assert(store.warm(version=1) == [point for point, result in store.best(1, version=1)])
+            optimizer = gd.run(function_to_minimize, parameters, 20, store=store, warm_version=1)
+            assert(optimizer.best_error <= store.best(1, version=1)[0][1])
+            print(store)
@@ -9,50 +9,65 @@ import math
 class GradientDescent(bbo.Optimization):
 
     RELATIVE_EPSILON = 0.00001
+    SPSA_PERTURBATION = 0.01 # Relative to each parameter's range
+    GRADIENTS = ("coordinate", "forward", "central", "spsa")
 
     """
     args:
-        m: Itterations
+        m: Itterations (function evaluations)
         alpha: learning rate
         beta: momentum rate
         gamma: RMS rate
+        gradient: how the gradient is estimated
+            coordinate: forward difference in one parameter per step (2 evaluations)
+            forward: full forward difference gradient (n + 1 evaluations, one batch)
+            central: full central difference gradient (2n evaluations, one batch)
+            spsa: simultaneous perturbation of every parameter (2 evaluations)
     """
-    def optimize(self, m=1000, alpha=0.3, beta=0.9, gamma=0.999):
-        # Construct momentum structure
-        momentum_coeffs = {}
-        rms_coeffs = {}
-        for p in self.params:
-            momentum_coeffs[p] = 0
-            rms_coeffs[p] = 0
-
-        parameter_num = 0
-
-        for i in range(int(m / 2)):
+    def _search(self, m=1000, alpha=0.3, beta=0.9, gamma=0.999, gradient="coordinate"):
+        assert(gradient in self.GRADIENTS)
+        if self.state is None:
+            # Construct momentum structure
+            self.state = {
+                "momentum_coeffs": [0] * len(self.params),
+                "rms_coeffs": [0] * len(self.params),
+                "step": 0,
+            }
+        self.phase = "gradient"
+        if gradient != "coordinate":
+            yield from self._search_full(m, alpha, beta, gamma, gradient)
+            return
+
+        s = self.state
+        momentum_coeffs = s["momentum_coeffs"]
+        rms_coeffs = s["rms_coeffs"]
+        while s["step"] < int(m / 2):
+            parameter_num = s["step"] % len(self.params)
             p = self.params[parameter_num]
-            mom = momentum_coeffs[p]
-            rms = rms_coeffs[p]
-
-            # Calculate the value
-            t1 = self._run()
-            self.error = t1
+            mom = momentum_coeffs[parameter_num]
+            rms = rms_coeffs[parameter_num]
 
             # Add epsilon to parameters
             epsilon = (p.max - p.min) * self.RELATIVE_EPSILON
             if (p.value + epsilon > p.max):
                 epsilon = -epsilon # Subtract instead
-            p.value += epsilon
+            base = self._params_to_tuple()
+            perturbed = list(base)
+            perturbed[parameter_num] += epsilon
 
-            # Calculate gradient
-            t2 = self._run()
+            # Calculate the value and the gradient (independent, so evaluate together)
+            t1, t2 = yield [base, perturbed]
+            self.error = t1
+            p.value += epsilon
             grad = (t2 - t1) / epsilon
 
             # Update momentum
             rms = (gamma * rms) + ((1 - gamma) * grad**2)
-            rms_coeffs[p] = rms
+            rms_coeffs[parameter_num] = rms
 
             # Update RMS
             mom = (beta * mom) + ((1 - beta) * grad)
-            momentum_coeffs[p] = mom
+            momentum_coeffs[parameter_num] = mom
 
             # Update value and constrain (Adam)
             p.value -= alpha * (mom) / (math.sqrt(rms) + epsilon) - epsilon
@@ -61,13 +76,98 @@ class GradientDescent(bbo.Optimization):
             elif (p.value < p.min):
                 p.value = p.min
 
-            parameter_num = (parameter_num + 1) % len(self.params)
-
-        return self.params
+            s["step"] += 1
+            if self._iteration():
+                break
+
+    def _search_full(self, m, alpha, beta, gamma, gradient):
+        n = len(self.params)
+        s = self.state
+        momentum_coeffs = s["momentum_coeffs"]
+        rms_coeffs = s["rms_coeffs"]
+        epsilons = [(p.max - p.min) * self.RELATIVE_EPSILON for p in self.params]
+        evaluations = {"forward": n + 1, "central": 2 * n, "spsa": 2}[gradient]
+        timed = bbo._timer(self.profiler)
+
+        # Leave one evaluation for the final point
+        while s["step"] < int((m - 1) / evaluations):
+            k = s["step"]
+            x = self._params_to_tuple()
+
+            # Perturbed points, all independent so they go out as one batch
+            if gradient == "spsa":
+                with timed("gradient"):
+                    c = self.SPSA_PERTURBATION / (k + 1)**0.101
+                    delta = [self.random.choice((-1, 1)) for i in range(n)]
+                    plus = self._clip([v + d * c * (p.max - p.min)
+                                       for v, d, p in zip(x, delta, self.params)])
+                    minus = self._clip([v - d * c * (p.max - p.min)
+                                        for v, d, p in zip(x, delta, self.params)])
+                t_plus, t_minus = yield [plus, minus]
+                grad = [(t_plus - t_minus) / (hi - lo) if hi != lo else 0
+                        for hi, lo in zip(plus, minus)]
+            else:
+                with timed("gradient"):
+                    points = []
+                    for i in range(n):
+                        point = list(x)
+                        if gradient == "central":
+                            point[i] = min(x[i] + epsilons[i], self.params[i].max)
+                        elif x[i] + epsilons[i] > self.params[i].max:
+                            point[i] = x[i] - epsilons[i] # Subtract instead
+                        else:
+                            point[i] = x[i] + epsilons[i]
+                        points.append(point)
+                    if gradient == "central":
+                        for i in range(n):
+                            point = list(x)
+                            point[i] = max(x[i] - epsilons[i], self.params[i].min)
+                            points.append(point)
+                    else:
+                        points.append(x)
+                results = yield points
+                grad = []
+                for i in range(n):
+                    j = n if gradient == "forward" else n + i # Lower point of the difference
+                    hi, lo = points[i][i], points[j][i]
+                    grad.append((results[i] - results[j]) / (hi - lo) if hi != lo else 0)
+                if gradient == "forward":
+                    self.error = results[n]
+
+            # Update every coordinate at once (Adam)
+            with timed("update"):
+                for i, p in enumerate(self.params):
+                    rms_coeffs[i] = (gamma * rms_coeffs[i]) + ((1 - gamma) * grad[i]**2)
+                    momentum_coeffs[i] = (beta * momentum_coeffs[i]) + ((1 - beta) * grad[i])
+                    p.value -= alpha * momentum_coeffs[i] / (math.sqrt(rms_coeffs[i]) + epsilons[i])
+                self._tuple_to_params(self._clip(self._params_to_tuple()))
+            s["step"] += 1
+            if self._iteration():
+                break
+
+        if not self.paused:
+            self.phase = "final"
+            self.error = (yield [self._params_to_tuple()])[0]
+
+    def immigrate(self, point, error):
+        if error >= self.error:
+            return False
+        self._tuple_to_params(point)
+        self.error = error
+        return True
+
+    def _clip(self, point):
+        return self.space.clip(point)
 
 
-def run(func, params, itterations=1000, **kwargs):
-    optimizer = GradientDescent(func, params)
+"""
+With a store (EvaluationStore), reuse its evaluations and start from its best point
+of warm_version (by default its own version, or the latest earlier one with any)
+"""
+def run(func, params, itterations=1000, store=None, warm_version=None, **kwargs):
+    optimizer = GradientDescent(func, params, cache=store)
+    if store is not None:
+        optimizer.warm_start(store.warm(1, warm_version))
     optimizer.optimize(m=itterations, **kwargs)
     return optimizer
 
@@ -81,3 +181,5 @@ if __name__ == "__main__":
             { "name": "jim", "min": -100.5, "max": -50, "value": -70}
         ]
     print(run(function_to_minimize, parameters))
+    for gradient in GradientDescent.GRADIENTS:
+        print(run(function_to_minimize, parameters, gradient=gradient))
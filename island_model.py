@@ -0,0 +1,127 @@
+"""
+Island model: independent copies (islands) of an optimizer searching from different
+random starts, optionally sharing their best points.
+
+Every island gets an equal share of one evaluation budget and its own seed. With
+migration, the islands are paused every migrate_every evaluations and each island is
+offered the best point of the island before it (a ring).
+"""
+
+import concurrent.futures
+import math
+import random
+
+
+"""
+Run (or continue) one island up to a number of evaluations, in a worker process
+"""
+def _run_island(optimizer, args, kwargs, evaluations):
+    optimizer.run_until(evaluations, *args, **kwargs)
+    return optimizer
+
+
+class IslandModel():
+
+    """
+    args:
+        optimization: Optimization subclass to run on each island
+        func, params: as for the Optimization
+        islands: number of islands
+        seed: seed for the island seeds (defaults to the global random module)
+        processes: run the islands in parallel on this many worker processes
+            (func and the constructor arguments must be picklable)
+        kwargs: passed to the constructor of every island
+    """
+    def __init__(self, optimization, func, params, islands=4, seed=None, processes=None,
+                 **kwargs):
+        rand = random if seed is None else random.Random(seed)
+        self.processes = processes
+        self.seeds = [rand.getrandbits(64) for i in range(islands)]
+        self.islands = []
+        for seed in self.seeds:
+            # Every island needs Parameters of its own
+            island_params = [p.to_dict() if hasattr(p, "to_dict") else dict(p) for p in params]
+            self.islands.append(optimization(func, island_params, seed=seed, **kwargs))
+        self.immigrants = [0] * islands
+        self.params = None
+        self.error = float('inf')
+
+    def __str__(self):
+        str = "Minimum: {:.5f}\nIslands:\n".format(self.error)
+        str += "\n".join(["  {}: {:.5f} after {} evaluations ({} immigrants)".format(
+            i, island.best_error, island.evaluations, immigrants)
+            for i, (island, immigrants) in enumerate(zip(self.islands, self.immigrants))])
+        return str
+
+    """
+    args:
+        evaluations: total evaluation budget, split evenly over the islands
+        migrate_every: evaluations (per island) between migrations, None for none
+        args, kwargs: passed to optimize() of every island, the budget argument (the
+            first one) is set to the island's share
+    Returns the parameters of the best island
+    """
+    def optimize(self, evaluations=10000, migrate_every=None, *args, **kwargs):
+        share = int(evaluations / len(self.islands))
+        args = (share,) + args
+        if self.processes:
+            with concurrent.futures.ProcessPoolExecutor(self.processes) as pool:
+                self._optimize(share, migrate_every, args, kwargs, pool)
+        else:
+            self._optimize(share, migrate_every, args, kwargs, None)
+
+        best = min(self.islands, key=lambda island: island.best_error)
+        best._tuple_to_params(best.best_point)
+        self.error = best.best_error
+        self.params = best.params
+        return self.params
+
+    def _optimize(self, share, migrate_every, args, kwargs, pool):
+        until = 0
+        while not all([island.finished for island in self.islands]):
+            until = min(until + migrate_every, share) if migrate_every else share
+            running = [i for i, island in enumerate(self.islands) if not island.finished]
+            if pool:
+                futures = {i: pool.submit(_run_island, self.islands[i], args, kwargs, until)
+                           for i in running}
+                for i, future in futures.items():
+                    self.islands[i] = future.result()
+            else:
+                for i in running:
+                    _run_island(self.islands[i], args, kwargs, until)
+
+            # Migrate around the ring
+            if migrate_every and len(self.islands) > 1:
+                bests = [(island.best_point, island.best_error) for island in self.islands]
+                for i, island in enumerate(self.islands):
+                    point, error = bests[i - 1]
+                    if point is not None and not island.finished and island.immigrate(point, error):
+                        self.immigrants[i] += 1
+
+    """
+    Per island statistics
+    """
+    def statistics(self):
+        return [{"seed": seed, "error": island.best_error, "point": island.best_point,
+                 "evaluations": island.evaluations, "immigrants": immigrants}
+                for seed, island, immigrants in zip(self.seeds, self.islands, self.immigrants)]
+
+
+def _rastrigin(**kwargs):
+    return sum([10 + v**2 - 10 * math.cos(2 * math.pi * v) for v in kwargs.values()])
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import dynamically_dimensioned_search as dds
+    import shuffled_complex_evolution as sce
+    parameters = [{"name": str(i), "min": -3, "max": 5.12} for i in range(5)]
+    for optimization in [dds.DynamicallyDimensionedSearch, sce.ShuffledComplexEvolution]:
+        serial = IslandModel(optimization, _rastrigin, parameters, islands=4, seed=1)
+        serial.optimize(4000, migrate_every=250)
+        print(serial)
+        assert(sum([s["evaluations"] for s in serial.statistics()]) <= 4000 + 4 * 100)
+        parallel = IslandModel(optimization, _rastrigin, parameters, islands=4, seed=1,
+                               processes=4)
+        parallel.optimize(4000, migrate_every=250)
+        assert(parallel.error == serial.error)
@@ -0,0 +1,271 @@
+"""
+Objective for models that are external executables: write a parameter file, run the
+model, read its output.
+
+A ModelPool keeps a fixed set of workers, each with a scratch directory of its own
+(on tmpfs when there is one) that is set up once and reused, so model runs in
+parallel never share files. Models that can stay running between evaluations
+(persistent=True) are started once per worker and only told to run again, which
+saves their start-up on every evaluation. Runs that take longer than the timeout are
+killed (with everything they started) and retried.
+
+The pool is both the function to minimize and the executor that runs its evaluations
+in parallel:
+    with ModelPool(["./model"], template, "output.txt", workers=8) as pool:
+        DynamicallyDimensionedSearch(pool, params, executor=pool).optimize(candidates=8)
+"""
+
+import concurrent.futures
+import os
+import queue
+import selectors
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from black_box_optimization import _scratch_base
+
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL) # The model and anything it started
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait()
+
+
+"""
+Read a line from a binary pipe, raising TimeoutExpired if there is none by deadline
+(None to wait forever) and EOFError if the pipe closes
+"""
+def _read_line(stream, deadline, command):
+    line = b""
+    with selectors.DefaultSelector() as selector:
+        selector.register(stream, selectors.EVENT_READ)
+        while not line.endswith(b"\n"):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and (remaining <= 0 or not selector.select(remaining)):
+                raise subprocess.TimeoutExpired(command, deadline)
+            chunk = os.read(stream.fileno(), 4096)
+            if not chunk:
+                raise EOFError("model exited")
+            line += chunk
+    return line
+
+
+class _Worker():
+
+    """
+    One scratch directory, and (if persistent) the model running in it
+    """
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.directory = tempfile.mkdtemp(prefix="model_{}_".format(index), dir=pool.scratch)
+        for path in pool.files:
+            target = os.path.join(self.directory, os.path.basename(path))
+            if os.path.isdir(path):
+                shutil.copytree(path, target)
+            else:
+                shutil.copy(path, target)
+        self.process = None
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            self.pool.command, cwd=self.directory, stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, bufsize=0, start_new_session=True)
+        self.pool._started()
+
+    def run(self, text):
+        pool = self.pool
+        with open(os.path.join(self.directory, pool.parameter_file), "w") as f:
+            f.write(text)
+        output = os.path.join(self.directory, pool.output) if pool.output else None
+        if output and os.path.exists(output):
+            os.remove(output)
+
+        if pool.persistent:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            deadline = None if pool.timeout is None else time.monotonic() + pool.timeout
+            try:
+                self.process.stdin.write(b"\n")
+                stdout = _read_line(self.process.stdout, deadline, pool.command)
+            except (subprocess.TimeoutExpired, EOFError, BrokenPipeError):
+                self.stop()
+                raise
+        else:
+            process = subprocess.Popen(pool.command, cwd=self.directory,
+                                       stdout=subprocess.PIPE, start_new_session=True)
+            pool._started()
+            try:
+                stdout, stderr = process.communicate(timeout=pool.timeout)
+            except subprocess.TimeoutExpired:
+                _kill(process)
+                raise
+            if process.returncode:
+                raise subprocess.CalledProcessError(process.returncode, pool.command)
+
+        if output:
+            with open(output) as f:
+                return pool.parse(f.read())
+        return pool.parse(stdout.decode())
+
+    def stop(self):
+        if self.process is not None:
+            _kill(self.process)
+            self.process = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ModelPool():
+
+    """
+    args:
+        command: the model executable and its arguments (run in the worker's directory)
+        template: contents of the parameter file, with {name} fields for the parameters
+        output: file the model writes its result to, None to read the result from
+            its standard output
+        parse: turns the output into the error (defaults to float)
+        workers: number of models run at once
+        timeout: seconds before a model run is killed, None for no limit
+        retries: times a killed or failed run is retried before giving up on the point
+        failure: error given to points the model couldn't be run for
+        parameter_file: name of the parameter file in the worker's directory
+        files: files and directories copied into every worker's directory once
+        persistent: the model is started once per worker and keeps running. It runs
+            an evaluation (rereading the parameter file) for every line on its
+            standard input and writes a line to its standard output when done (the
+            result, unless output is set)
+        scratch: where the worker directories go (defaults to tmpfs if available)
+    """
+    def __init__(self, command, template, output=None, parse=float, workers=4, timeout=None,
+                 retries=1, failure=float('inf'), parameter_file="parameters.txt", files=(),
+                 persistent=False, scratch=None):
+        self.command = list(command)
+        self.template = template
+        self.output = output
+        self.parse = parse
+        self.timeout = timeout
+        self.retries = retries
+        self.failure = failure
+        self.parameter_file = parameter_file
+        self.files = list(files)
+        self.persistent = persistent
+        self.scratch = scratch if scratch is not None else _scratch_base()
+        self.evaluations = 0
+        self.starts = 0 # Model processes started
+        self.timeouts = 0
+        self.failures = 0 # Points given the failure error
+        self._workers = [_Worker(self, i) for i in range(workers)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __str__(self):
+        return "evaluations: {}, model starts: {}, timeouts: {}, failures: {}".format(
+            self.evaluations, self.starts, self.timeouts, self.failures)
+
+    """
+    Evaluate one point on the next idle worker
+    """
+    def __call__(self, **kwargs):
+        text = self.template.format(**kwargs)
+        worker = self._idle.get()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    result = worker.run(text)
+                    with self._lock:
+                        self.evaluations += 1
+                    return result
+                except subprocess.TimeoutExpired:
+                    with self._lock:
+                        self.timeouts += 1
+                except (subprocess.CalledProcessError, EOFError, BrokenPipeError,
+                        OSError, ValueError):
+                    pass
+            with self._lock:
+                self.failures += 1
+            return self.failure
+        finally:
+            self._idle.put(worker)
+
+    def _started(self):
+        with self._lock:
+            self.starts += 1
+
+    """
+    Executor interface, runs fn (usually the Objective wrapping this pool) on the
+    workers
+    """
+    def map(self, fn, *iterables):
+        return self._executor.map(fn, *iterables)
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown()
+        for worker in self._workers:
+            worker.close()
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import sys
+    import dynamically_dimensioned_search as dds
+    # Sum of the parameters, hangs while x is above 90 (until killed)
+    model = """
+import sys, time
+def run():
+    values = dict(line.split("=") for line in open("parameters.txt").read().split())
+    x, y = float(values["x"]), float(values["y"])
+    if x > 90:
+        time.sleep(60)
+    return x + y
+if "persistent" in sys.argv:
+    for line in sys.stdin:
+        print(run(), flush=True)
+else:
+    open("output.txt", "w").write(str(run()))
+"""
+    parameters = [{"name": "x", "min": 0, "max": 100}, {"name": "y", "min": -100.5, "max": -50}]
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, "model.py")
+        with open(script, "w") as f:
+            f.write(model)
+        template = "x={x}\ny={y}\n"
+
+        with ModelPool([sys.executable, "model.py"], template, "output.txt", workers=4,
+                       timeout=2, files=[script]) as pool:
+            assert(pool(x=1, y=-60) == -59)
+            start = time.time()
+            assert(pool(x=95, y=-60) == float('inf')) # Hung, killed and retried
+            assert(pool.timeouts == 2 and pool.failures == 1 and time.time() - start < 10)
+            optimizer = dds.DynamicallyDimensionedSearch(pool, parameters, executor=pool, seed=1)
+            optimizer.optimize(m=40, candidates=4)
+            print(optimizer)
+            print(pool)
+            assert(optimizer.error < -90)
+
+        with ModelPool([sys.executable, script, "persistent"], template, workers=2,
+                       timeout=2, persistent=True) as pool:
+            optimizer = dds.DynamicallyDimensionedSearch(pool, parameters, executor=pool, seed=1)
+            optimizer.optimize(m=40, candidates=2)
+            print(pool)
+            assert(pool.starts <= 2 + pool.timeouts) # Models only restarted after kills
+            assert(pool.evaluations + pool.failures == 40)
@@ -0,0 +1,155 @@
+"""
+Screening candidates at lower fidelities (coarser resolutions, shorter simulation
+periods...) so that only the most promising ones are evaluated at full cost.
+
+Objectives that support it take an optional fidelity argument, func(**kwargs,
+fidelity=level), and are called without it for full fidelity. Given to an
+Optimization as its fidelity argument, a SuccessiveHalving screens the DDS candidates
+and SCE mutation points by successive halving: eta**len(levels) times as many
+candidates as are needed are evaluated at the lowest level, the best 1/eta of them go
+on to the next level, and so on, and only the survivors are evaluated at full
+fidelity.
+
+Budgets (m, itt) and Optimization.evaluations count full fidelity evaluations only,
+the evaluations made at every level are in counts. Points evaluated at successive
+levels measure the bias between them (bias()), which screening is immune to as long
+as it is about the same for every point.
+"""
+
+import math
+
+
+class SuccessiveHalving():
+
+    """
+    args:
+        levels: fidelities below full, lowest first, passed to func as its fidelity
+        eta: one in eta points evaluated at a level goes on to the next one
+        memory: screened points remembered to pair their results with the next level's
+    """
+    def __init__(self, levels, eta=3, memory=10000):
+        assert(levels and eta > 1)
+        self.levels = list(levels)
+        self.eta = eta
+        self.memory = memory
+        self.counts = {level: 0 for level in self.levels + [None]} # None is full fidelity
+        self.differences = {} # (lower, higher): [sum of higher - lower, points]
+        self._last = {} # point: (level, result) of its last screening evaluation
+
+    def __str__(self):
+        bias = self.bias()
+        lines = []
+        for lower, level in zip([None] + self.levels, self.levels + [None]):
+            line = "{}: {} evaluations".format("full" if level is None else level, self.counts[level])
+            if (lower, level) in bias:
+                line += ", bias {:+.5g} from {}".format(bias[(lower, level)], lower)
+            lines.append(line)
+        return "\n".join(lines)
+
+    """
+    Number of candidates screened to keep n
+    """
+    def candidates(self, n):
+        return n * self.eta ** len(self.levels)
+
+    """
+    Successive halving of candidates down to the best n. A generator yielding
+    (level, points) to be evaluated at level and sent their results, returns the
+    survivors (best first) to be evaluated at full fidelity.
+    """
+    def screen(self, candidates, n):
+        candidates = [tuple(point) for point in candidates]
+        for level in self.levels:
+            if len(candidates) <= n:
+                break
+            results = yield level, candidates
+            keep = max(n, math.ceil(len(candidates) / self.eta))
+            order = sorted(range(len(candidates)), key=results.__getitem__)
+            for i in order[keep:]: # Out, won't be paired with another level
+                self._last.pop(candidates[i], None)
+            candidates = [candidates[i] for i in order[:keep]]
+        return candidates[:n]
+
+    """
+    Count evaluations made at levels (one per point, None for full fidelity) and pair
+    their results with those of the same points at the level before
+    """
+    def record(self, points, results, levels):
+        for point, result, level in zip(points, results, levels):
+            self.counts[level] = self.counts.get(level, 0) + 1
+            point = tuple(point)
+            last = self._last.pop(point, None)
+            if last is not None and math.isfinite(result) and math.isfinite(last[1]):
+                difference = self.differences.setdefault((last[0], level), [0, 0])
+                difference[0] += result - last[1]
+                difference[1] += 1
+            if level is not None:
+                self._last[point] = (level, result)
+                if len(self._last) > self.memory:
+                    del self._last[next(iter(self._last))] # Oldest
+
+    """
+    Mean difference between the results at a level and the level before it, by
+    (lower, higher) level (None for full fidelity)
+    """
+    def bias(self):
+        return {levels: total / n for levels, (total, n) in self.differences.items() if n}
+
+
+def _model(fidelity=None, **kwargs):
+    # The error, with a coarse-grid offset that shrinks as the fidelity goes up
+    error = sum([(v - 1)**2 for v in kwargs.values()])
+    if fidelity is None:
+        return error
+    return error + 10 * (1 - fidelity) + 0.1 * (1 - fidelity) * math.sin(sum(kwargs.values()))
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import dynamically_dimensioned_search as dds
+    import shuffled_complex_evolution as sce
+    fidelity = SuccessiveHalving([0.1, 0.5])
+    screening = fidelity.screen([(i,) for i in range(20)], 2)
+    level, points = next(screening)
+    assert(level == 0.1 and len(points) == 20)
+    level, points = screening.send([-v for v, in points])
+    assert(level == 0.5 and points == [(19,), (18,), (17,), (16,), (15,), (14,), (13,)])
+    try:
+        screening.send([v for v, in points])
+        assert(False)
+    except StopIteration as e:
+        assert(e.value == [(13,), (14,)])
+
+    parameters = [{"name": str(i), "min": -5, "max": 5} for i in range(4)]
+    plain = dds.DynamicallyDimensionedSearch(_model, parameters, seed=1)
+    plain.optimize(100, candidates=2)
+    fidelity = SuccessiveHalving([0.1, 0.5])
+    screened = dds.DynamicallyDimensionedSearch(_model, parameters, seed=1, fidelity=fidelity)
+    screened.optimize(100, candidates=2)
+    print(fidelity)
+    print("DDS: {:.3g} screened, {:.3g} without".format(screened.best_error, plain.best_error))
+    assert(screened.evaluations == plain.evaluations == fidelity.counts[None] == 100)
+    assert(fidelity.counts[0.1] == 99 * 9 and fidelity.counts[0.5] == 99 * 3)
+    assert(abs(fidelity.bias()[(0.1, 0.5)] + 4) < 0.2)
+    assert(abs(fidelity.bias()[(0.5, None)] + 5) < 0.1)
+    assert(screened.best_error < plain.best_error)
+
+    serial = sce.ShuffledComplexEvolution(_model, parameters, seed=1,
+                                          fidelity=SuccessiveHalving([0.1, 0.5]))
+    serial.optimize(itt=300)
+    parallel = sce.ShuffledComplexEvolution(_model, parameters, seed=1,
+                                            fidelity=SuccessiveHalving([0.1, 0.5]))
+    parallel.optimize(itt=300, processes=2)
+    print(serial.fidelity)
+    assert(serial.error == parallel.error)
+    assert(serial.fidelity.counts == parallel.fidelity.counts)
+    assert(serial.fidelity.counts[0.1] > 0 and serial.fidelity.counts[None] == serial.evaluations)
+
+    # Full fidelity points batched with screening ones still go through the cache
+    import evaluation_cache
+    cache = evaluation_cache.EvaluationCache()
+    cached = sce.ShuffledComplexEvolution(_model, parameters, seed=1, cache=cache,
+                                          fidelity=SuccessiveHalving([0.1, 0.5]))
+    cached.optimize(itt=300)
+    assert(cache.hits + cache.misses == cached.fidelity.counts[None] and cache.hits > 0)
+    assert(cached.error == serial.error)
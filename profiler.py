@@ -0,0 +1,166 @@
+"""
+Instrumentation of an optimizer run: where the time goes (the objective or the
+optimizer's own work, section by section), how many evaluations each phase of the
+search made, and callbacks on evaluations, itterations and improvements.
+
+Given to an Optimization as its profiler argument. Without one, the optimizers only
+pay for a few "is None" checks.
+"""
+
+import time
+
+
+class _Section():
+
+    """
+    Reusable context manager adding the time spent in it to a [seconds, calls] timing.
+    Not reentrant: sections of the same name can't be nested.
+    """
+    __slots__ = ("timing", "start")
+
+    def __init__(self, timing):
+        self.timing = timing
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timing[0] += time.perf_counter() - self.start
+        self.timing[1] += 1
+
+
+class Profiler():
+
+    """
+    args:
+        on_evaluation: called with (point, result, phase) for every evaluation
+        on_iteration: called with the optimizer at the end of every itteration
+        on_improvement: called with (point, error, evaluations) whenever the best error
+            improves
+
+    Timed sections:
+        search: the optimizer's own work between evaluations (includes the sections
+            below that run in the search)
+        objective: evaluating func (for async runs, awaiting the whole batch)
+        and per optimizer: perturb (DDS), gradient and update (gradient descent), rank,
+            partition, weighted_sample, centroid, hypercube and shuffle (SCE)
+    With worker processes (SCE processes) the sections timed in the workers, objective
+    included, are summed over the workers so they can add up to more than seconds.
+    """
+    def __init__(self, on_evaluation=None, on_iteration=None, on_improvement=None):
+        self.on_evaluation = on_evaluation
+        self.on_iteration = on_iteration
+        self.on_improvement = on_improvement
+        self.timings = {} # name: [seconds, calls]
+        self.evaluations = {} # phase: evaluations
+        self.iterations = 0
+        self.improvements = 0
+        self.seconds = 0 # Time the optimizer has been running
+        self._sections = {}
+        self._started = None
+
+    def __str__(self):
+        report = self.report()
+        str = "Time: {:.3f}s (objective {:.3f}s, overhead {:.3f}s)\n".format(
+            report["seconds"], report["objective"], report["overhead"])
+        str += "Evaluations: {}\n".format(", ".join(
+            ["{}: {}".format(phase, n) for phase, n in self.evaluations.items()]))
+        str += "\n".join(["  {}: {:.6f}s over {} calls".format(name, seconds, calls)
+                          for name, (seconds, calls) in sorted(
+                              self.timings.items(), key=lambda t: -t[1][0])])
+        return str
+
+    """
+    Context manager timing a named section:
+        with profiler.time("rank"):
+            ...
+    """
+    def time(self, name):
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = _Section(self.timings.setdefault(name, [0, 0]))
+        return section
+
+    """
+    Add timings made elsewhere (e.g. by a profiler in a worker process)
+    """
+    def merge(self, timings):
+        for name, (seconds, calls) in timings.items():
+            timing = self.timings.setdefault(name, [0, 0])
+            timing[0] += seconds
+            timing[1] += calls
+
+    def start(self):
+        if self._started is None:
+            self._started = time.perf_counter()
+
+    def stop(self):
+        if self._started is not None:
+            self.seconds += time.perf_counter() - self._started
+            self._started = None
+
+    def evaluated(self, points, results, phases):
+        for i, (point, result) in enumerate(zip(points, results)):
+            phase = phases[i] if isinstance(phases, list) else phases
+            self.evaluations[phase] = self.evaluations.get(phase, 0) + 1
+            if self.on_evaluation is not None:
+                self.on_evaluation(point, result, phase)
+
+    def iteration(self, optimizer):
+        self.iterations += 1
+        if self.on_iteration is not None:
+            self.on_iteration(optimizer)
+
+    def improvement(self, point, error, evaluations):
+        self.improvements += 1
+        if self.on_improvement is not None:
+            self.on_improvement(point, error, evaluations)
+
+    """
+    Totals so far: wall time, time in the objective, the rest (the optimizer's
+    overhead), evaluations per phase and the timings of every section
+    """
+    def report(self):
+        seconds = self.seconds
+        if self._started is not None:
+            seconds += time.perf_counter() - self._started
+        objective = self.timings.get("objective", [0, 0])[0]
+        evaluations = sum(self.evaluations.values())
+        return {
+            "seconds": seconds,
+            "objective": objective,
+            "overhead": seconds - objective,
+            "overhead_per_evaluation": (seconds - objective) / evaluations if evaluations else None,
+            "evaluations": dict(self.evaluations),
+            "iterations": self.iterations,
+            "improvements": self.improvements,
+            "timings": {name: {"seconds": timing[0], "calls": timing[1]}
+                        for name, timing in self.timings.items()},
+        }
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import shuffled_complex_evolution as sce
+    import dynamically_dimensioned_search as dds
+    import gradient_descent as gd
+    parameters = [{"name": str(i), "min": -5, "max": 10} for i in range(4)]
+    improvements = []
+    for optimization, kwargs in [(sce.ShuffledComplexEvolution, {}),
+                                 (sce.ShuffledComplexEvolution, {"processes": 2}),
+                                 (dds.DynamicallyDimensionedSearch, {}),
+                                 (gd.GradientDescent, {"gradient": "central"})]:
+        evaluations = []
+        profiler = Profiler(on_evaluation=lambda *args: evaluations.append(args),
+                            on_improvement=lambda *args: improvements.append(args))
+        optimizer = optimization(sce._sum_of_values, parameters, seed=1, profiler=profiler)
+        optimizer.optimize(500, **kwargs)
+        report = profiler.report()
+        assert(sum(report["evaluations"].values()) == optimizer.evaluations == len(evaluations))
+        assert(report["objective"] > 0 and report["timings"]["search"]["calls"] > 0)
+        assert(improvements[-1][1] == optimizer.best_error)
+        assert(profiler.iterations > 0)
+        unprofiled = optimization(sce._sum_of_values, parameters, seed=1)
+        unprofiled.optimize(500, **kwargs)
+        assert(unprofiled.error == optimizer.error)
+    print(profiler)
@@ -0,0 +1,159 @@
+"""
+Large read-only data (observed time series...) shared by the objective across worker
+processes without copies.
+
+Arrays added to a SharedData are written once to a file on tmpfs (when there is one),
+and the SharedArray handles returned for them pickle as just the path, format and
+shape. Wherever a handle is used it memory-maps the file read-only, once per process,
+so every worker reads the same pages instead of holding (or unpickling) a copy.
+
+    with SharedData() as data:
+        observed = data.add("flow", flow)
+        func = functools.partial(misfit, observed=observed) # Picklable, and small
+        ShuffledComplexEvolution(func, params).optimize(processes=8)
+
+    def misfit(observed, **kwargs):
+        flow = observed.view # or observed.numpy()
+"""
+
+import array
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+
+from black_box_optimization import _scratch_base
+
+
+_maps = {} # path: mmap, the files this process has mapped
+
+
+class SharedArray():
+
+    """
+    Picklable handle of an array of a SharedData. view is a read-only memoryview of it
+    (2D for 2D arrays), mapped the first time it is used in a process.
+    """
+    def __init__(self, path, format, shape):
+        self.path = path
+        self.format = format
+        self.shape = tuple(shape)
+        self._view = None
+
+    def __getstate__(self):
+        return {"path": self.path, "format": self.format, "shape": self.shape}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["format"], state["shape"])
+
+    @property
+    def view(self):
+        if self._view is None:
+            m = _maps.get(self.path)
+            if m is None:
+                with open(self.path, "rb") as f:
+                    m = _maps[self.path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(m).cast(self.format, self.shape)
+        return self._view
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        return self.view[index]
+
+    """
+    The array as a read-only numpy array over the same memory (requires numpy)
+    """
+    def numpy(self):
+        import numpy
+        return numpy.frombuffer(self.view.cast("B"), dtype=self.format).reshape(self.shape)
+
+
+class SharedData():
+
+    """
+    args:
+        directory: where the files go (defaults to tmpfs if available)
+    """
+    def __init__(self, directory=None):
+        self.directory = tempfile.mkdtemp(prefix="shared_",
+                                          dir=directory if directory is not None else _scratch_base())
+        self.arrays = {}
+        # Don't leave the files behind if close() is never called
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    """
+    Share values: anything with the buffer protocol (array.array, numpy array, bytes...)
+    that is contiguous, or a sequence of floats. Returns its handle.
+    """
+    def add(self, name, values):
+        assert(name not in self.arrays)
+        if not isinstance(values, (bytes, bytearray, memoryview, array.array)) and \
+                not hasattr(values, "__array_interface__"):
+            values = array.array('d', values)
+        view = memoryview(values)
+        assert(view.c_contiguous)
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(view.cast("B"))
+        self.arrays[name] = SharedArray(path, view.format, view.shape)
+        return self.arrays[name]
+
+    """
+    Unmap and remove every array, handles still in use elsewhere keep working until
+    they're dropped (the memory is freed once nothing maps it)
+    """
+    def close(self):
+        for shared in self.arrays.values():
+            if shared._view is not None:
+                shared._view.release()
+                shared._view = None
+            m = _maps.pop(shared.path, None)
+            if m is not None:
+                try:
+                    m.close()
+                except BufferError: # Still viewed by someone else
+                    pass
+        self.arrays = {}
+        self._cleanup()
+
+
+def _misfit(observed, **kwargs):
+    values = observed.view
+    return sum([abs(values[i, 0] * kwargs["a"] + kwargs["b"] - values[i, 1])
+                for i in range(len(values))])
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import functools
+    import pickle
+    import shuffled_complex_evolution as sce
+    # y = 2x + 1 observed at 1000 points
+    series = array.array('d')
+    for i in range(1000):
+        series.extend((i / 100, 2 * i / 100 + 1))
+    parameters = [{"name": "a", "min": 0, "max": 5}, {"name": "b", "min": -5, "max": 5}]
+    with SharedData() as data:
+        observed = data.add("observed", memoryview(series).cast("B").cast("d", [1000, 2]))
+        assert(len(pickle.dumps(observed)) < 300)
+        assert(observed[999, 1] == series[-1])
+        func = functools.partial(_misfit, observed)
+        serial = sce.ShuffledComplexEvolution(func, parameters, seed=1)
+        serial.optimize(itt=300)
+        parallel = sce.ShuffledComplexEvolution(func, parameters, seed=1, shared=data)
+        parallel.optimize(itt=300, processes=2)
+        assert(serial.error == parallel.error)
+        assert(data.arrays == {} and not os.path.exists(data.directory)) # Closed at the end
+        print(parallel)
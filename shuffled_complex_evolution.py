@@ -9,29 +9,263 @@ This algorithm is based off of:
     Authors: Duan, Q. Y., Gupta, V. K., & Sorooshian, S
 """
 
-import copy
-import random
+import array
+import concurrent.futures
+import heapq
 import math
+import operator
+import random
+import time
 
 import black_box_optimization as bbo
 
-class ShuffledComplexEvolution(bbo.Optimization):
 
-    D = None
+class Population():
+
+    """
+    Points and their results kept as parallel arrays. Everything that runs once per
+    point or dimension goes through builtins (sorted, zip, map) rather than Python loops.
+    """
+    def __init__(self, points=(), results=()):
+        self.points = [tuple(point) for point in points]
+        self.results = array.array('d', results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def rank(self):
+        order = sorted(range(len(self)), key=self.results.__getitem__)
+        self.points = [self.points[i] for i in order]
+        self.results = array.array('d', [self.results[i] for i in order])
+
+    """
+    Deal the ranked population into p complexes of at most m points each
+    """
+    def partition(self, p, m):
+        stop = p * m
+        return [Population(self.points[k:stop:p], self.results[k:stop:p]) for k in range(p)]
+
+    @staticmethod
+    def merge(populations):
+        merged = Population()
+        for population in populations:
+            merged.points.extend(population.points)
+            merged.results.extend(population.results)
+        return merged
+
+    """
+    Weighted sample of n locations without replacement (Efraimidis-Spirakis keys),
+    returned in rank order so the worst sampled point is last
+    """
+    def weighted_sample(self, rand, n, weights):
+        keys = [rand.random() ** (1 / w) for w in weights]
+        return sorted(heapq.nlargest(n, range(len(keys)), key=keys.__getitem__))
+
+    def centroid(self, locations):
+        rows = [self.points[l] for l in locations]
+        return tuple([s / len(rows) for s in map(math.fsum, zip(*rows))])
+
+    """
+    Smallest hypercube containing the points at locations, as (mins, maxs)
+    """
+    def hypercube(self, locations):
+        rows = [self.points[l] for l in locations]
+        return list(map(min, *rows)), list(map(max, *rows))
+
+
+def _random_in_hypercube(rand, mins, maxs):
+    return tuple([(hi - lo) * rand.random() + lo for lo, hi in zip(mins, maxs)])
+
+
+"""
+Random point in the hypercube of the points at locations L of A. With a surrogate,
+the most promising of surrogate.screen random points.
+"""
+def _mutation(rand, A, L, surrogate):
+    hypercube = A.hypercube(L)
+    if surrogate is None or not surrogate.ready():
+        return _random_in_hypercube(rand, *hypercube)
+    return surrogate.best([_random_in_hypercube(rand, *hypercube)
+                           for i in range(surrogate.screen)])[0]
+
+
+"""
+The point to use out of candidates: with a fidelity, the survivor of their successive
+halving at the lower fidelities, yielding its CCE steps. Without, the only candidate.
+"""
+def _screened(fidelity, candidates):
+    if fidelity is None:
+        return candidates[0]
+    screening = fidelity.screen(candidates, 1)
+    try:
+        level, points = next(screening)
+        while True:
+            level, points = screening.send(
+                (yield [(point, "screening", level) for point in points]))
+    except StopIteration as e:
+        return e.value[0]
+
+
+"""
+Whether point is worth evaluating to try to beat error, always without a surrogate
+"""
+def _promising(surrogate, point, error):
+    return surrogate is None or not surrogate.ready() or surrogate.predict(point) < error
+
+
+"""
+Competitive complex evolution (Step 4) of a single complex A. This only touches A,
+so the complexes can be evolved independently (and in other processes) until the
+shuffle.
+A generator yielding lists of new points to be evaluated together, as (point, the
+step that made it, fidelity level or None for full), and sent their results.
+Args:
+    bounds: (min, max) of each parameter
+    A: complex, a ranked Population
+    seed: seed of the random stream used for this complex
+    timed: section timer (see bbo._timer)
+    surrogate: model of the objective, reflections and contractions it predicts won't
+        beat the worst point are skipped and mutations are screened with it
+    speculative: evaluate the reflection, contraction and mutation points of an
+        offspring at once instead of one after the other, the offspring is picked by
+        the same rules and the results that aren't needed are thrown away
+    fidelity: SuccessiveHalving each mutation point is screened with, out of
+        fidelity.candidates(1) random points
+Returns the evolved complex and the number of (full fidelity) function calls made
+"""
+def _cce(bounds, A, q, alpha, beta, seed, timed=bbo._not_timed, surrogate=None,
+         speculative=False, fidelity=None):
+    mutations = 1 if fidelity is None else fidelity.candidates(1)
+    rand = random.Random(seed)
+    func_calls = 0
+    m = len(A)
+    mins = [lo for lo, hi in bounds]
+    maxs = [hi for lo, hi in bounds]
+
+    # Step 4.1: Assign weights
+    weights = [2 * (m + 1 - i) / (m * (m + 1)) for i in range(1, m + 1)]
+    for __askdf in range(beta):
+        # Step 4.2: Choose q points based on probability distribution
+        with timed("weighted_sample"):
+            L = A.weighted_sample(rand, min(q, m), weights)
+        if len(L) < 2:
+            break
+        worst = L[-1]
+
+        # Step 4.3: Generate Offspring
+
+        # 4.3 a) Compute Centroid in each dimension
+        with timed("centroid"):
+            centroid = A.centroid(L[:-1])
+
+        # 4.3 b) Calculate the new point
+        for __qjwhbf in range(alpha):
+            # Vector scaling and subtraction
+            r = tuple([2 * g - ug for g, ug in zip(centroid, A.points[worst])])
+
+            # 4.3 c) If r is in the problem space, chill, else mutate
+            phase = "reflection"
+            if not (all(map(operator.le, mins, r)) and all(map(operator.le, r, maxs))):
+                with timed("hypercube"):
+                    r = [_mutation(rand, A, L, surrogate) for i in range(mutations)]
+                r = yield from _screened(fidelity, r)
+                phase = "mutation"
+            evaluate_r = phase == "mutation" or _promising(surrogate, r, A.results[worst])
+
+            if speculative:
+                # Everything that could be needed: r, c and z
+                c = tuple([(c + a) / 2 for c, a in zip(centroid, A.points[worst])])
+                with timed("hypercube"):
+                    z = [_mutation(rand, A, L, surrogate) for i in range(mutations)]
+                z = yield from _screened(fidelity, z)
+                steps = [(r, phase, None)] if evaluate_r else []
+                if _promising(surrogate, c, A.results[worst]):
+                    steps.append((c, "contraction", None))
+                steps.append((z, "mutation", None))
+                results = yield steps
+                func_calls += len(steps)
+                # The first of r and c better than the worst point, else z
+                for (point, step, level), result in zip(steps, results):
+                    if result < A.results[worst] or point is z:
+                        A.points[worst], A.results[worst] = point, result
+                        break
+                continue
+
+            if evaluate_r:
+                result, = yield [(r, phase, None)]
+                func_calls += 1
+            else:
+                result = float('inf') # Skipped
+
+            # 4.3 d) If the new point r is better than the worst one in B, replace it
+            if result < A.results[worst]:
+                A.points[worst], A.results[worst] = r, result
+
+            # Else, compute point_c and evaluate
+            else:
+                c = tuple([(c + a) / 2 for c, a in zip(centroid, A.points[worst])])
+                if _promising(surrogate, c, A.results[worst]):
+                    result, = yield [(c, "contraction", None)]
+                    func_calls += 1
+                else:
+                    result = float('inf') # Skipped
+
+                # 4.3 e) If the new point c is better than the worst one in B, replace it,
+                #    else replace it with a random point
+                if result < A.results[worst]:
+                    A.points[worst], A.results[worst] = c, result
+                else:
+                    with timed("hypercube"):
+                        z = [_mutation(rand, A, L, surrogate) for i in range(mutations)]
+                    z = yield from _screened(fidelity, z)
+                    A.points[worst], A.results[worst] = z, (yield [(z, "mutation", None)])[0]
+                    func_calls += 1
+
+        # Step 4.4: Replace Parents by offspring (done in place) and sort A
+        with timed("rank"):
+            A.rank()
+
+        # Step 4.5: Itterate
+
+    return A, func_calls
+
 
-    def _weighted_sample(self, n, samples, weights):
-        ret_samples = []
-        ret_loc = []
-        for i in range(n):
-            choice = random.choices(k=1, population=range(len(weights)), weights=weights)[0] # choose something
-            weights[choice] = 0 # remove the weight
-            ret_samples.append(samples[choice])
-            ret_loc.append(choice)
-        return ret_samples, ret_loc
+"""
+Evolve a complex calling run on each new point, used in the worker processes.
+Returns what the CCE does (the evolved complex and its function calls), the
+(point, result, phase, level) of every evaluation and the
+timings of the profiler (if one was given). A surrogate is updated with the results
+of this complex only.
+"""
+def _evolve_complex(run, bounds, A, q, alpha, beta, seed, profiler=None, surrogate=None,
+                    speculative=False, fidelity=None):
+    timed = bbo._timer(profiler)
+    cce = _cce(bounds, A, q, alpha, beta, seed, timed, surrogate, speculative, fidelity)
+    evaluated = []
+    try:
+        steps = next(cce)
+        while True:
+            results = []
+            for point, phase, level in steps:
+                with timed("objective"):
+                    result = run(point, level)
+                evaluated.append((point, result, phase, level))
+                if surrogate is not None and level is None:
+                    surrogate.add([point], [result])
+                results.append(result)
+            steps = cce.send(results)
+    except StopIteration as e:
+        return e.value, evaluated, profiler and profiler.timings
+
+
+class ShuffledComplexEvolution(bbo.Optimization):
 
+    D = None
+    warm = () # Points for the initial population, see warm_start()
 
     """
-    Yes this would be so much simpler with something like numpy or a vector representation
+    Without processes the complexes are evolved in lockstep: each ask() holds the next
+    point (or points, when speculative) of every complex.
     Args:
         itt: minimum number of function calls
         p: number of complexes
@@ -39,141 +273,324 @@ class ShuffledComplexEvolution(bbo.Optimization):
         q: number randomly selected from a complex
         alpha: number of times to mutate and kill offsprint
         beta: number of offspring to be generated per complex
+        processes: evolve the complexes in parallel on this many worker processes
+            (func must be picklable)
+        speculative: evaluate the reflection, contraction and mutation points of each
+            offspring together, rather than only the ones needed. Up to three times the
+            evaluations (the unused ones count towards itt) for up to a third of the
+            sequential steps, worth it when workers would be idle otherwise (an
+            executor with more workers than complexes). No gain with processes, where
+            each complex is evaluated sequentially.
+    With a fidelity, each mutation point is the survivor of fidelity.candidates(1)
+    random points screened at the lower fidelities, and itt only counts full fidelity
+    calls.
 
     SCE1: p = 1
     SCE2: m = beta = 2n+1, alpha=1, where n = dimensions
+
+    Every complex evolves with its own random stream seeded from self.random, so
+    serial and parallel runs with the same seed give the same result (unless there is
+    a surrogate: in the workers it only learns from the complex's own evaluations).
     """
-    def optimize(self, itt=1000, p=5, m=5, q=10, alpha=2, beta=2):
-        func_calls = 0
+    def _search(self, itt=1000, p=5, m=5, q=10, alpha=2, beta=2, processes=None,
+                speculative=False):
+        if processes:
+            with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+                yield from self._search_complexes(itt, p, m, q, alpha, beta, pool, speculative)
+        else:
+            yield from self._search_complexes(itt, p, m, q, alpha, beta, None, speculative)
+
+    def _search_complexes(self, itt, p, m, q, alpha, beta, pool, speculative):
+        bounds = list(zip(self.space.mins, self.space.maxs))
+        timed = bbo._timer(self.profiler)
 
         # Step 1: Generate m x p points and evaluate
-        if not self.D:
-            D = []
-            for i in range(m * p):
-                point = [0] * len(self.params)
-                for j in range(len(self.params)):
-                    param = self.params[j]
-                    point[j] = (param.max - param.min) * random.random() + param.min
-                D.append({"params": tuple(point), "result": self._run(point)})
-                func_calls += 1
-        else:
-            D = self.D
+        if self.state is None:
+            if not self.D:
+                points = self._initial_points(bounds, m * p)
+                self.phase = "initial"
+                self.state = {"D": Population(points, (yield points)), "func_calls": len(points)}
+            else:
+                self.state = {"D": self.D, "func_calls": 0}
+        s = self.state
 
-        while (func_calls < itt):
+        while (s["func_calls"] < itt):
 
             # Step 2: Rank points
-            D.sort(key=lambda x : x["result"])
+            with timed("rank"):
+                s["D"].rank()
 
             # Step 3: Partition into p complexes
-            complexes = []
-            for k in range(p):
-                complexes.append([D[k + p * j] for j in range(m) if (k + p * j) < len(D)])
+            with timed("partition"):
+                complexes = s["D"].partition(p, m)
 
             # Step 4: Evolve Each Complex CCE
-            # Step 4.1: Assign weights
-            weights = [2 * (m + 1 - i) / (m * (m + 1)) for i in range(1, m + 1)]
-            for __askdf in range(beta):
-
-                for A in complexes:
-                    # Step 4.2: Choose q points based on probability distribution
-                    B, L = self._weighted_sample(q, A, weights)
-
-                    # Step 4.3: Generate Offspring
-
-                    # 4.3 a) Compute Centroid in each dimension
-                    centroid = [0] * len(self.params)
-
-                    for point in B[:-1]:
-                        # Vector addition
-                        centroid = [c + p for c, p in zip(centroid, point["params"])]
-
-                    # Vector multiplication
-                    centroid = tuple([c * (1 / (len(B) - 1)) for c in centroid])
-
-                    # 4.3 b) Calculate the new point
-                    for __qjwhbf in range(alpha):
-                        # Vector scaling and subtraction
-                        r = tuple([2 * g - ug for g, ug in zip(centroid, B[-1]["params"])])
-
-                        # 4.3 c) If r is in the problem space, chill, else mutate
-                        if self._valid_point(r):
-                            point_r = {"params": r, "result": self._run(r)}
-                            func_calls += 1
-
-                        else:
-                            # Compute the smallest hypercube that contains all of B
-                            mins = [float('inf')] * len(self.params)
-                            maxs = [-float('inf')] * len(self.params)
-                            for point in B:
-                                params = point["params"]
-                                for i in range(len(self.params)):
-                                    if params[i] > maxs[i]:
-                                        maxs[i] = params[i]
-                                    elif params[i] < mins[i]:
-                                        mins[i] = params[i]
-
-                            # Generate a random value within the hypercube
-                            point = [0] * len(self.params)
-                            for i in range(len(self.params)):
-                                point[i] = (maxs[i] - mins[i]) * random.random() + mins[i]
-                            r = tuple(point)
-                            point_r = {"params": r, "result": self._run(r)}
-                            func_calls += 1
-
-                        # 4.3 d) If the new point r is better than the last one in B,
-                        #    set the point_B[-1] to r
-                        if point_r["result"] < B[-1]["result"]:
-                            B[-1] = point_r
-
-                        # Else, compute point_c and evaluate
-                        else:
-                            c = tuple([(c + a) / 2 for c, a in zip(centroid, B[-1]["params"])])
-                            point_c = {"params": c, "result": self._run(c)}
-                            func_calls += 1
-
-                            # 4.3 e) If the new point c is better than the last one in B,
-                            #    set the point point_B[-1] to c
-                            if point_c["result"] < B[-1]["result"]:
-                                B[-1] = point_c
-                            else:
-                                mins = [float('inf')] * len(self.params)
-                                maxs = [-float('inf')] * len(self.params)
-                                for point in B:
-                                    params = point["params"]
-                                    for i in range(len(self.params)):
-                                        if params[i] > maxs[i]:
-                                            maxs[i] = params[i]
-                                        elif params[i] < mins[i]:
-                                            mins[i] = params[i]
-
-                                # Generate a random value within the hypercube
-                                point = [0] * len(self.params)
-                                for i in range(len(self.params)):
-                                    point[i] = (maxs[i] - mins[i]) * random.random() + mins[i]
-                                z = tuple(point)
-                                point_z = point_z = {"params": z, "result": self._run(z)}
-                                func_calls += 1
-                                B[-1] = point_z
-
-                # Step 4.4: Replace Parents by offspring and sort A
-                for i, l in enumerate(L):
-                    A[l] = B[i]
-
-                A.sort(key=lambda x: x["result"])
-
-                # Step 4.5: Itterate
+            seeds = [self.random.getrandbits(64) for A in complexes]
+            if pool:
+                run = self._objective()
+                # Workers time into profilers of their own (callbacks stay here)
+                profiler = None if self.profiler is None else type(self.profiler)()
+                futures = [pool.submit(_evolve_complex, run, bounds, A, q, alpha, beta, seed,
+                                       profiler, self.surrogate, speculative, self.fidelity)
+                           for A, seed in zip(complexes, seeds)]
+                evolved = []
+                for f in futures: # Shuffle barrier
+                    (A, calls), evaluated, timings = f.result()
+                    if timings:
+                        self.profiler.merge(timings)
+                    if evaluated:
+                        points, results, phases, levels = [list(column) for column in zip(*evaluated)]
+                        self._record(points, results, phases, levels)
+                        self._count(points, results, levels)
+                        if self.cache is not None: # Kept for later (not looked up here)
+                            for point, result, level in zip(points, results, levels):
+                                if level is None:
+                                    self.cache.put(point, result)
+                    evolved.append((A, calls))
+            else:
+                evolved = yield from self._evolve_lockstep(
+                    [_cce(bounds, A, q, alpha, beta, seed, timed, self.surrogate, speculative,
+                          self.fidelity)
+                     for A, seed in zip(complexes, seeds)])
 
             # Step 5: Shuffle Complexes
-            D = []
-            for A in complexes:
-                D.extend(A)
-
-        self._tuple_to_params(D[0]["params"])
-        self.error = D[0]["result"]
+            with timed("shuffle"):
+                s["D"] = Population.merge([A for A, calls in evolved])
+            s["func_calls"] += sum([calls for A, calls in evolved])
+            if self._iteration():
+                break
+
+        D = s["D"]
+        D.rank()
+        self._tuple_to_params(D.points[0])
+        self.error = D.results[0]
         self.D = D
 
+    def _spread(self):
+        D = self.state["D"] if self.state is not None else self.D
+        if not D:
+            return None
+        return math.prod([(hi - lo) / (b_hi - b_lo) if b_hi > b_lo else 1
+                          for lo, hi, b_lo, b_hi in zip(map(min, *D.points), map(max, *D.points),
+                                                        self.space.mins, self.space.maxs)])
+
+    """
+    The points (up to p * m of them) go into the initial population of the next search
+    in place of random ones, with the parameters set to the best
+    """
+    def warm_start(self, points):
+        super().warm_start(points)
+        self.warm = [tuple(point) for point in points]
+
+    def _initial_points(self, bounds, n):
+        points = list(self.warm[:n])
+        self.warm = ()
+        return points + [_random_in_hypercube(self.random, *zip(*bounds))
+                         for i in range(n - len(points))]
+
+    """
+    Immigrants replace the worst point of the population
+    """
+    def immigrate(self, point, error):
+        D = self.state["D"] if self.state is not None else self.D
+        if not D or error >= max(D.results):
+            return False
+        worst = D.results.index(max(D.results))
+        D.points[worst] = tuple(point)
+        D.results[worst] = error
+        return True
+
+    """
+    Asynchronous, steady-state SCE for objectives whose run times vary a lot. Every
+    complex starts its next CCE as soon as its last one is done and its offspring go
+    straight back into the population, so no complex waits for the slowest evaluation
+    of the others. The population is ranked and repartitioned (Steps 2, 3 and 5) every
+    shuffle_every evaluations rather than once every complex has finished.
+    Evaluations go to self.executor (which needs submit(), a thread pool of p workers
+    without one) one per complex at a time (three when speculative), so use at least
+    as many complexes as workers. The cache isn't used.
+    Which offspring see which depends on the order evaluations finish in, so runs are
+    not repeatable. Checkpoints continue as the generational search.
+    Args:
+        as for optimize(), and
+        shuffle_every: evaluations between shuffles (defaults to p * alpha * beta)
+    """
+    def optimize_steady_state(self, itt=1000, p=5, m=5, q=10, alpha=2, beta=2,
+                              speculative=False, shuffle_every=None):
+        shuffle_every = shuffle_every or p * alpha * beta
+        bounds = list(zip(self.space.mins, self.space.maxs))
+        timed = bbo._timer(self.profiler)
+        self._arguments = ((itt, p, m, q, alpha, beta, None, speculative), {})
+        self._search_steps = None
+        self.finished = False
+        self.paused = False
+        self.stop_reason = None
+        self._improved_at = self.evaluations
+        self._started = time.time()
+        if self.profiler is not None:
+            self.profiler.start()
+
+        executor = self.executor or concurrent.futures.ThreadPoolExecutor(p)
+        objective = self._objective()
+
+        # Step 1: Generate m x p points and evaluate
+        if not self.D:
+            points = self._initial_points(bounds, m * p)
+            self.phase = "initial"
+            with timed("objective"):
+                results = list(executor.map(objective, points))
+            self._record(points, results)
+            self._count(points, results)
+            self.state = {"D": Population(points, results), "func_calls": len(points)}
+        else:
+            self.state = {"D": self.D, "func_calls": 0}
+        s = self.state
+        with timed("rank"):
+            s["D"].rank()
+
+        running = {} # future: (complex, step, level)
+        evolving = {} # complex: [cce, its copy of the complex, before, steps, results]
+        held = set() # Points of the complexes being evolved
+        waiting = set() # Complexes waiting for points held by others (after a shuffle)
+        since_shuffle = 0
+        stopping = False
+        exhausted = False # A step didn't fit in the budget, no new CCEs
+
+        def advance(k, results):
+            nonlocal exhausted
+            cce = evolving[k][0]
+            try:
+                steps = next(cce) if results is None else cce.send(results)
+            except StopIteration:
+                release(k)
+                return False
+            # Room for the step's full fidelity evaluations (at least one to come)
+            running_full = [level for k, i, level in running.values()].count(None)
+            needed = max(1, [level for point, phase, level in steps].count(None))
+            if stopping or s["func_calls"] + running_full + needed > itt:
+                exhausted = True
+                cce.close()
+                release(k)
+                return False
+            evolving[k][3:] = [steps, [None] * len(steps)]
+            for i, (point, phase, level) in enumerate(steps):
+                running[executor.submit(objective, point, level)] = (k, i, level)
+            return True
+
+        def release(k):
+            cce, A, before, steps, results = evolving.pop(k)
+            _merge_back(s["D"], before, A)
+            held.difference_update(before)
+
+        # Step 4: Evolve each complex as soon as it is free
+        def evolve(k):
+            D = s["D"]
+            A = Population(D.points[k:p * m:p], D.results[k:p * m:p])
+            if held.intersection(A.points):
+                waiting.add(k)
+                return False
+            waiting.discard(k)
+            held.update(A.points)
+            A.rank() # Offspring went in where their parents were, so it may not be ranked
+            cce = _cce(bounds, A, q, alpha, beta, self.random.getrandbits(64), timed,
+                       self.surrogate, speculative, self.fidelity)
+            evolving[k] = [cce, A, list(A.points), None, None]
+            return advance(k, None)
+
+        try:
+            for k in range(p):
+                evolve(k)
+            while running:
+                done, pending = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    k, i, level = running.pop(future)
+                    steps, results = evolving[k][3:]
+                    point, phase, level = steps[i]
+                    results[i] = future.result()
+                    self._record([point], [results[i]], phase, level)
+                    self._count([point], [results[i]], level)
+                    if level is None:
+                        s["func_calls"] += 1
+                        since_shuffle += 1
+                    if None in results: # Waiting for the rest of the complex's points
+                        continue
+                    if not advance(k, results) and not stopping and not exhausted:
+                        evolve(k) # The complex is free again
+                        for j in list(waiting):
+                            evolve(j)
+
+                # Steps 5, 2 and 3: Shuffle, without waiting for the running CCEs
+                if since_shuffle >= shuffle_every and not stopping:
+                    since_shuffle = 0
+                    with timed("shuffle"):
+                        s["D"].rank()
+                    stopping = self._iteration()
+        finally:
+            if executor is not self.executor:
+                executor.shutdown()
+
+        D = s["D"]
+        D.rank()
+        self._tuple_to_params(D.points[0])
+        self.error = D.results[0]
+        self.D = D
+        self._end()
         return self.params
 
+    """
+    Run the CCE generators side by side, batching the next point of each of them
+    """
+    def _evolve_lockstep(self, cces):
+        evolved = [None] * len(cces)
+        pending = {}
+        for i, cce in enumerate(cces):
+            try:
+                pending[i] = next(cce)
+            except StopIteration as e:
+                evolved[i] = e.value
+        while pending:
+            steps = [step for cce_steps in pending.values() for step in cce_steps]
+            self.phase = [phase for point, phase, level in steps]
+            self.level = [level for point, phase, level in steps]
+            results = yield [point for point, phase, level in steps]
+            start = 0
+            for i, cce_steps in list(pending.items()):
+                cce_results = results[start:start + len(cce_steps)]
+                start += len(cce_steps)
+                try:
+                    pending[i] = cces[i].send(cce_results)
+                except StopIteration as e:
+                    evolved[i] = e.value
+                    del pending[i]
+        return evolved
+
+
+"""
+Put what a CCE changed in its copy A of a complex (before holds the complex's points
+as it was copied) back into the population D. Each point the CCE replaced is
+replaced in D too; if D no longer has it (another CCE got there first), the new point
+takes the place of D's worst point if it is better.
+"""
+def _merge_back(D, before, A):
+    kept = set(A.points)
+    removed = [point for point in before if point not in kept]
+    previous = set(before)
+    added = [(point, result) for point, result in zip(A.points, A.results)
+             if point not in previous]
+    for old, (new, result) in zip(removed, added):
+        try:
+            i = D.points.index(old)
+        except ValueError:
+            i = D.results.index(max(D.results))
+            if result >= D.results[i]:
+                continue
+        D.points[i], D.results[i] = new, result
+
+
+def _sum_of_values(**kwargs):
+    return sum(kwargs.values())
+
 
 if __name__ == "__main__":
     # Short test
@@ -186,3 +603,44 @@ if __name__ == "__main__":
     optimizer = ShuffledComplexEvolution(function_to_minimize, parameters)
     optimizer.optimize()
     print(optimizer)
+
+    serial = ShuffledComplexEvolution(_sum_of_values, parameters, seed=1)
+    serial.optimize(itt=200)
+    parallel = ShuffledComplexEvolution(_sum_of_values, parameters, seed=1)
+    parallel.optimize(itt=200, processes=2)
+    assert(serial.error == parallel.error)
+    assert(serial.evaluations == parallel.evaluations)
+
+    # Heavy-tailed evaluation times
+    import time
+    def slow_function(**kwargs):
+        time.sleep(0.001 * min(random.paretovariate(1.2), 50))
+        return sum(kwargs.values())
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        start = time.time()
+        optimizer = ShuffledComplexEvolution(slow_function, parameters, seed=1, executor=executor)
+        optimizer.optimize_steady_state(itt=300, p=8)
+        print("Steady state: {:.5f} in {:.3f}s".format(optimizer.error, time.time() - start))
+        assert(optimizer.evaluations == 300 and optimizer.stop_reason == "budget")
+        # Not repeatable (evaluations finish in any order), only a sanity bound
+        assert(optimizer.error < -75)
+
+    # Speculative: fewer rounds of evaluations, the discarded ones count too
+    rounds = {}
+    for speculative in (False, True):
+        optimizer = ShuffledComplexEvolution(function_to_minimize, parameters, seed=1)
+        optimizer.start(itt=300, p=2, speculative=speculative)
+        rounds[speculative] = 0
+        while not optimizer.finished:
+            points = optimizer.ask()
+            optimizer.tell([sum(point) for point in points])
+            rounds[speculative] += 1
+        print("Speculative={}: {:.5f}, {} evaluations in {} rounds".format(
+            speculative, optimizer.error, optimizer.evaluations, rounds[speculative]))
+        assert(optimizer.error < -90)
+    assert(rounds[True] < rounds[False])
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        optimizer = ShuffledComplexEvolution(slow_function, parameters, seed=1, executor=executor)
+        optimizer.optimize_steady_state(itt=300, p=4, speculative=True)
+        assert(300 - 3 < optimizer.evaluations <= 300) # Last offspring don't fit
+        assert(optimizer.stop_reason == "budget" and optimizer.error < -75)
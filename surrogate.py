@@ -0,0 +1,153 @@
+"""
+Cheap model of the objective, fitted on the evaluations made so far, used to screen
+candidate points so the expensive objective is only run on the most promising ones.
+
+RBFSurrogate interpolates the archive of evaluated points with gaussian radial basis
+functions (in coordinates normalized to the parameter ranges). The interpolation
+matrix is kept as a Cholesky factorization that grows by one row per new point, so
+adding a point costs O(n^2) instead of a refit. Once the archive reaches max_points
+it is cut down to its best half and refactored, which bounds the cost per point.
+"""
+
+import math
+
+
+class RBFSurrogate():
+
+    """
+    args:
+        max_points: largest archive kept, fitting costs grow with its square
+        screen: candidate points generated per point that gets evaluated
+        scale: length scale of the basis functions, relative to the diagonal of the
+            normalized parameter space
+        nugget: regularization added to the diagonal, keeps close points stable
+        min_points: evaluations needed before any screening (defaults to dimensions + 1)
+    """
+    def __init__(self, max_points=200, screen=20, scale=0.3, nugget=1e-6, min_points=None):
+        assert(max_points >= 2)
+        self.max_points = max_points
+        self.screen = screen
+        self.scale = scale
+        self.nugget = nugget
+        self.min_points = min_points
+        self.points = [] # Normalized
+        self.results = []
+        self.factor = [] # Lower triangular rows of the Cholesky factor
+        self.weights = []
+        self.mean = 0
+        self.refits = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    """
+    Called by the Optimization with its parameters, to normalize the points
+    """
+    def bind(self, params):
+        self.mins = [p.min for p in params]
+        self.ranges = [(p.max - p.min) or 1 for p in params]
+        self.length2 = (self.scale * math.sqrt(len(params)))**2
+        if self.min_points is None:
+            self.min_points = len(params) + 1
+
+    def ready(self):
+        return len(self.points) >= self.min_points
+
+    def _normalize(self, point):
+        return [(v - lo) / r for v, lo, r in zip(point, self.mins, self.ranges)]
+
+    def _kernel(self, a, b):
+        return math.exp(-sum([(x - y)**2 for x, y in zip(a, b)]) / self.length2)
+
+    def add(self, points, results):
+        for point, result in zip(points, results):
+            if math.isfinite(result):
+                self._append(self._normalize(point), result)
+        if len(self.points) > self.max_points:
+            self._shrink()
+        self._solve()
+
+    """
+    Add a row to the Cholesky factor. Points (almost) fully explained by the others,
+    i.e. (near) duplicates, are dropped to keep the factor well conditioned.
+    """
+    def _append(self, x, result):
+        row = [self._kernel(x, p) for p in self.points]
+        for j, factor_row in enumerate(self.factor):
+            row[j] = (row[j] - sum([a * b for a, b in zip(factor_row, row[:j])])) / factor_row[j]
+        diagonal = 1 + self.nugget - sum([v * v for v in row])
+        if diagonal <= 10 * self.nugget:
+            return
+        row.append(math.sqrt(diagonal))
+        self.factor.append(row)
+        self.points.append(x)
+        self.results.append(result)
+
+    def _shrink(self):
+        keep = sorted(range(len(self.points)), key=self.results.__getitem__)[:self.max_points // 2]
+        points = [self.points[i] for i in keep]
+        results = [self.results[i] for i in keep]
+        self.points, self.results, self.factor = [], [], []
+        for x, result in zip(points, results):
+            self._append(x, result)
+        self.refits += 1
+
+    def _solve(self):
+        n = len(self.points)
+        if not n:
+            return
+        self.mean = math.fsum(self.results) / n
+        # L z = y - mean, then L^T w = z
+        z = []
+        for i, row in enumerate(self.factor):
+            z.append((self.results[i] - self.mean - sum([a * b for a, b in zip(row, z)])) / row[i])
+        w = [0] * n
+        for i in reversed(range(n)):
+            w[i] = (z[i] - sum([self.factor[j][i] * w[j] for j in range(i + 1, n)])) / self.factor[i][i]
+        self.weights = w
+
+    def predict(self, point):
+        x = self._normalize(point)
+        return self.mean + sum([w * self._kernel(x, p) for w, p in zip(self.weights, self.points)])
+
+    """
+    The n points predicted to be best, best first
+    """
+    def best(self, points, n=1):
+        return sorted(points, key=self.predict)[:n]
+
+
+if __name__ == "__main__":
+    print("Testing...")
+    import random
+    import black_box_optimization as bbo
+    sphere = lambda point: sum([v**2 for v in point])
+    surrogate = RBFSurrogate(max_points=40)
+    surrogate.bind([bbo.Parameter(str(i), -5, 5) for i in range(3)])
+    rand = random.Random(1)
+    points = [[rand.uniform(-5, 5) for i in range(3)] for j in range(30)]
+    surrogate.add(points, [sphere(point) for point in points])
+    assert(surrogate.ready() and surrogate.refits == 0)
+    for point in points: # Interpolates
+        assert(abs(surrogate.predict(point) - sphere(point)) < 1e-2 * (1 + sphere(point)))
+    assert(surrogate.best([(4, 4, 4), (0.5, 0, -0.5), (-4, 3, 0)]) == [(0.5, 0, -0.5)])
+    surrogate.add(points[:1] * 2, [sphere(points[0])] * 2) # Duplicates are dropped
+    assert(len(surrogate) == 30)
+    points = [[rand.uniform(-5, 5) for i in range(3)] for j in range(20)]
+    surrogate.add(points, [sphere(point) for point in points])
+    assert(len(surrogate) <= 40 and surrogate.refits == 1)
+
+    import dynamically_dimensioned_search as dds
+    import shuffled_complex_evolution as sce
+    parameters = [{"name": str(i), "min": -2, "max": 3} for i in range(4)]
+    for optimization in [dds.DynamicallyDimensionedSearch, sce.ShuffledComplexEvolution]:
+        plain = optimization(sphere, parameters, seed=1, call="array")
+        plain.optimize(150)
+        screened = optimization(sphere, parameters, seed=1, call="array",
+                                surrogate=RBFSurrogate())
+        screened.optimize(150)
+        print("{}: {:.3g} screened, {:.3g} without".format(
+            optimization.__name__, screened.best_error, plain.best_error))
+        assert(screened.evaluations <= plain.evaluations + 25)
+        if optimization is dds.DynamicallyDimensionedSearch:
+            assert(screened.best_error < plain.best_error)
@@ -0,0 +1,211 @@
+"""
+Benchmark of the optimizers on standard test functions over several dimensions and
+seeds. Records wall time, optimizer overhead per evaluation, evaluations needed to
+reach a target error and the final error, writes them as JSON and compares them
+against a stored baseline.
+
+    python benchmark.py                      # run and compare with benchmark_baseline.json
+    python benchmark.py --update-baseline    # run and store the results as the baseline
+"""
+
+import os
+import sys
+bbo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, bbo_path)
+import argparse
+import json
+import math
+import platform
+import random
+import statistics as stats
+import time
+
+from gradient_descent import GradientDescent
+from dynamically_dimensioned_search import DynamicallyDimensionedSearch
+from shuffled_complex_evolution import ShuffledComplexEvolution
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+SEEDS = 5
+EVALUATIONS = 2000
+DIMENSIONS = [2, 10, 30]
+ERROR_TOLERANCE = 0.1 # Relative worsening of the median final error counted as a regression
+OVERHEAD_TOLERANCE = 1.5 # Factor of the baseline overhead counted as a regression
+
+
+def rosenbrock(x):
+    return sum([100 * (x[i + 1] - x[i]**2)**2 + (1 - x[i])**2 for i in range(len(x) - 1)])
+
+
+def rastrigin(x):
+    return sum([10 + v**2 - 10 * math.cos(2 * math.pi * v) for v in x])
+
+
+def ackley(x):
+    n = len(x)
+    return -20 * math.exp(-0.2 * math.sqrt(sum([v**2 for v in x]) / n)) \
+        - math.exp(sum([math.cos(2 * math.pi * v) for v in x]) / n) + 20 + math.e
+
+
+def griewank(x):
+    return 1 + sum([v**2 for v in x]) / 4000 \
+        - math.prod([math.cos(v / math.sqrt(i + 1)) for i, v in enumerate(x)])
+
+
+class NoisySphere():
+
+    """
+    Sphere with gaussian noise, seeded so runs repeat
+    """
+    def __init__(self, seed, sigma=0.01):
+        self.random = random.Random(seed)
+        self.sigma = sigma
+
+    def __call__(self, x):
+        return sum([v**2 for v in x]) + self.random.gauss(0, self.sigma)
+
+
+# name: (function or factory taking a seed, min, max, target error)
+#   bounds are asymmetric so no optimum sits at the middle of the range
+FUNCTIONS = {
+    "rosenbrock": (rosenbrock, -2, 3, 1e-2),
+    "rastrigin": (rastrigin, -3, 5.12, 1),
+    "ackley": (ackley, -10, 32.768, 1e-1),
+    "griewank": (griewank, -300, 600, 1e-1),
+    "noisy_sphere": (NoisySphere, -3, 5, 1e-1),
+}
+
+# name: (Optimization, optimize kwargs)
+OPTIMIZERS = {
+    "dds": (DynamicallyDimensionedSearch, {}),
+    "sce": (ShuffledComplexEvolution, {}),
+    "gradient_descent": (GradientDescent, {"gradient": "central"}),
+}
+
+
+class Tracker():
+
+    """
+    Wraps an objective, timing it and noting when the target error is first reached
+    """
+    def __init__(self, func, target):
+        self.func = func
+        self.target = target
+        self.evaluations = 0
+        self.seconds = 0
+        self.to_target = None
+
+    def __call__(self, x):
+        start = time.perf_counter()
+        result = self.func(x)
+        self.seconds += time.perf_counter() - start
+        self.evaluations += 1
+        if self.to_target is None and result <= self.target:
+            self.to_target = self.evaluations
+        return result
+
+
+def run_one(function, dimensions, optimizer, seed, evaluations):
+    func, min, max, target = FUNCTIONS[function]
+    if isinstance(func, type):
+        func = func(seed)
+    tracker = Tracker(func, target)
+    optimization, kwargs = OPTIMIZERS[optimizer]
+    params = [{"name": "x{:03d}".format(i), "min": min, "max": max} for i in range(dimensions)]
+
+    start = time.perf_counter()
+    o = optimization(tracker, params, seed=seed, call="array")
+    o.optimize(evaluations, **kwargs)
+    wall_time = time.perf_counter() - start
+    return {
+        "wall_time": wall_time,
+        "overhead_per_evaluation": (wall_time - tracker.seconds) / tracker.evaluations,
+        "evaluations": tracker.evaluations,
+        "evaluations_to_target": tracker.to_target,
+        "final_error": o.best_error,
+    }
+
+
+def run(seeds=SEEDS, evaluations=EVALUATIONS, dimensions=DIMENSIONS,
+        functions=list(FUNCTIONS), optimizers=list(OPTIMIZERS)):
+    results = []
+    for function in functions:
+        for n in dimensions:
+            for optimizer in optimizers:
+                runs = [run_one(function, n, optimizer, seed, evaluations) for seed in range(seeds)]
+                reached = [r["evaluations_to_target"] for r in runs if r["evaluations_to_target"]]
+                results.append({
+                    "function": function,
+                    "dimensions": n,
+                    "optimizer": optimizer,
+                    "wall_time": stats.mean([r["wall_time"] for r in runs]),
+                    "overhead_per_evaluation": stats.median([r["overhead_per_evaluation"] for r in runs]),
+                    "evaluations": stats.mean([r["evaluations"] for r in runs]),
+                    "reached_target": len(reached) / len(runs),
+                    "evaluations_to_target": stats.median(reached) if reached else None,
+                    "final_error": stats.median([r["final_error"] for r in runs]),
+                    "final_errors": [r["final_error"] for r in runs],
+                })
+                print("{function:>12} {dimensions:>3}d {optimizer:>16}: error {final_error:.4g}, "
+                      "target {reached_target:.0%}, overhead {overhead_us:.1f}us/eval".format(
+                          overhead_us=results[-1]["overhead_per_evaluation"] * 1e6, **results[-1]))
+    return {
+        "config": {"seeds": seeds, "evaluations": evaluations, "dimensions": dimensions},
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+"""
+Compare with a baseline run of the same config, returns the list of regressions
+"""
+def compare(current, baseline):
+    if current["config"] != baseline["config"]:
+        return ["config differs from the baseline ({} vs {})".format(current["config"], baseline["config"])]
+    key = lambda r: (r["function"], r["dimensions"], r["optimizer"])
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        b = previous.get(key(r))
+        if b is None:
+            continue
+        name = "{} {}d {}".format(*key(r))
+        if r["final_error"] > b["final_error"] + ERROR_TOLERANCE * abs(b["final_error"]) + 1e-12:
+            regressions.append("{}: final error {:.4g} (baseline {:.4g})".format(
+                name, r["final_error"], b["final_error"]))
+        if r["reached_target"] < b["reached_target"]:
+            regressions.append("{}: reached target {:.0%} (baseline {:.0%})".format(
+                name, r["reached_target"], b["reached_target"]))
+        if r["overhead_per_evaluation"] > OVERHEAD_TOLERANCE * b["overhead_per_evaluation"]:
+            regressions.append("{}: overhead {:.1f}us/eval (baseline {:.1f}us/eval)".format(
+                name, r["overhead_per_evaluation"] * 1e6, b["overhead_per_evaluation"] * 1e6))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the optimizers")
+    parser.add_argument("--seeds", type=int, default=SEEDS)
+    parser.add_argument("--evaluations", type=int, default=EVALUATIONS)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=DIMENSIONS)
+    parser.add_argument("--functions", nargs="+", default=list(FUNCTIONS), choices=list(FUNCTIONS))
+    parser.add_argument("--optimizers", nargs="+", default=list(OPTIMIZERS), choices=list(OPTIMIZERS))
+    parser.add_argument("--output", help="write the results as JSON here")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    current = run(args.seeds, args.evaluations, args.dimensions, args.functions, args.optimizers)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=1)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=1)
+        print("Baseline written to {}".format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f))
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.baseline))
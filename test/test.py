@@ -2,13 +2,18 @@ import os
 import sys
 bbo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, bbo_path)
+import asyncio
+import json
 import random
 import statistics as stats
+import tempfile
+import time
 
 from black_box_optimization import Parameter
 from gradient_descent import GradientDescent
 from dynamically_dimensioned_search import DynamicallyDimensionedSearch
 from shuffled_complex_evolution import ShuffledComplexEvolution
+from surrogate import RBFSurrogate
 
 TEST_REPEAT = 100
 TEST_ITTERATIONS = 500
@@ -38,25 +43,17 @@ def test_function_2(**kwargs):
     return sum_conv
 
 
-# Rosenbrock Function (BROKEN: Working on this)
-#   f(x_0, x_1) = b(x_1 - x_0^2) + (a - x_0^2)^2
+# Rosenbrock Function, centered on the middle of the ranges (a = 0)
+#   f(x_0, x_1) = b(x_1 - x_0^2)^2 + (a - x_0)^2
 def test_function_3(**kwargs):
     global test_class
+    x = []
+    for name, value in kwargs.items():
+        p = test_class.get_param_by_name(name)
+        x.append(value - ((p.max + p.min) / 2))
     fx = 0
-    args = list(zip(kwargs.keys(), kwargs.values()))
-    for i in range(int(len(args) / 2)):
-        x0 = args[i * 2]
-        p = test_class.get_param_by_name(x0[0])
-        x0_n = x0[1] - ((p.max + p.min) / 2)
-        if len(args) > (i + 1):
-            x1 = args[i * 2 + 1]
-            p = test_class.get_param_by_name(x1[0])
-            x1_n = x1[1] - ((p.max + p.min) / 2)
-        else:
-            x1 = (0, "zero")
-            x1_n = 0
-
-        fx += 100 * (x1_n - x0_n**2) + (0 - x0_n)**2
+    for i in range(len(x) - 1):
+        fx += 100 * (x[i + 1] - x[i]**2)**2 + (0 - x[i])**2
     return fx
 
 
@@ -141,7 +138,96 @@ class TestProblem():
 
 
 
+# Runs each optimizer through optimize_async against a local stand-in model server,
+#   the results have to match the synchronous optimizer with the same seed
+def test_async(num_params=TEST_DIMENSIONS, delay=0.002):
+    params = [{"name": str(i), "min": -i - 1, "max": i + 1} for i in range(num_params)]
+
+    async def handle(reader, writer):
+        kwargs = json.loads(await reader.readline())
+        await asyncio.sleep(delay) # The model run
+        writer.write((json.dumps(test_function_1(**kwargs)) + "\n").encode())
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def objective(**kwargs):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write((json.dumps(kwargs) + "\n").encode())
+            result = json.loads(await reader.readline())
+            writer.close()
+            return result
+
+        tests = [(DynamicallyDimensionedSearch, {"candidates": 8}),
+                 (ShuffledComplexEvolution, {}),
+                 (GradientDescent, {"gradient": "central"})]
+        async with server:
+            for optimization, kwargs in tests:
+                print("test async {}".format(optimization.__name__))
+                start = time.time()
+                optimizer = optimization(objective, params, seed=1)
+                await optimizer.optimize_async(TEST_ITTERATIONS, concurrency=8, **kwargs)
+                print("  time: {:.3f}s".format(time.time() - start))
+                expected = optimization(test_function_1, params, seed=1)
+                expected.optimize(TEST_ITTERATIONS, **kwargs)
+                assert(optimizer.error == expected.error)
+
+    asyncio.run(main())
+
+
+# Crashes each optimizer part way through and resumes it from its last checkpoint,
+#   it has to end up exactly where an uninterrupted run does
+def test_resume(num_params=TEST_DIMENSIONS):
+    params = [{"name": str(i), "min": -i - 1, "max": i + 1} for i in range(num_params)]
+    tests = [(DynamicallyDimensionedSearch, {"candidates": 2}, None),
+             (DynamicallyDimensionedSearch, {}, RBFSurrogate),
+             (ShuffledComplexEvolution, {}, None),
+             (ShuffledComplexEvolution, {}, RBFSurrogate),
+             (GradientDescent, {}, None),
+             (GradientDescent, {"gradient": "spsa"}, None)]
+
+    class Crash(Exception):
+        pass
+
+    for optimization, kwargs, surrogate in tests:
+        print("test resume {} {}{}".format(optimization.__name__, kwargs,
+                                           " with a surrogate" if surrogate else ""))
+        expected = optimization(test_function_1, params, seed=1,
+                                surrogate=surrogate and surrogate())
+        expected.optimize(TEST_ITTERATIONS, **kwargs)
+
+        calls = []
+        def crashing_function(**kwargs):
+            calls.append(kwargs)
+            if len(calls) > TEST_ITTERATIONS / 2:
+                raise Crash()
+            return test_function_1(**kwargs)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint")
+            optimizer = optimization(crashing_function, params, seed=1,
+                                     surrogate=surrogate and surrogate())
+            optimizer.checkpoint_every(path, evaluations=TEST_ITTERATIONS / 10)
+            try:
+                optimizer.optimize(TEST_ITTERATIONS, **kwargs)
+                assert(False)
+            except Crash:
+                pass
+
+            resumed = optimization(test_function_1, params, seed=1,
+                                   surrogate=surrogate and surrogate())
+            resumed.resume(path)
+        assert(resumed.error == expected.error)
+        assert([p.value for p in resumed.params] == [p.value for p in expected.params])
+
+
 if __name__ == "__main__":
+    test_async()
+    test_resume()
+
     print("Testing Gradient Descent...")
     test_class = TestProblem(GradientDescent, TEST_DIMENSIONS)
     test_class.run_all(TEST_REPEAT)